@@ -1,11 +1,8 @@
 from flask import Flask, jsonify
 from flask_jwt_extended import JWTManager
-from flask_swagger_ui import get_swaggerui_blueprint
-from apscheduler.schedulers.background import BackgroundScheduler
-from tasks.scheduled_tasks import scan_for_fraud
 from config import Config
 from models import init_models, db
-from flask_cors import CORS
+from services import pool_metrics
 import logging
 import os
 
@@ -30,15 +27,48 @@ def jwt_config(app):
     app.config['JWT_HEADER_NAME'] = Config.JWT_HEADER_NAME
     app.config['JWT_HEADER_TYPE'] = Config.JWT_HEADER_TYPE
 
-def create_app(config_class=Config):
+def create_cli_app(config_class=Config):
+    """
+    Lightweight app for scripts and workers: config, models and the DB engine only.
+    No blueprints, Swagger, create_all, background threads or scheduler.
+    """
+    # Register every mapped class so relationships resolve without the blueprints
+    from models import (
+        export_job, idempotency_key, job_lock, ledger, transaction, transaction_rollup, user, wallet, wallet_shard,
+        wallet_volume
+    )
+    
     app = Flask(__name__)
-    CORS(app)  # Enable CORS for all routes
     app.config.from_object(config_class)
+    # Instrument the connection pool before the engine is created
+    pool_metrics.init_app(app)
+    init_models(app)
+    return app
+
+def create_app(config_class=Config):
+    # Web-only dependencies are imported here so scripts using create_cli_app skip them
+    from flask_cors import CORS
+    from flask_swagger_ui import get_swaggerui_blueprint
+    from services import (
+        fraud_window, group_commit, identity_cache, ledger, mail_queue, metrics, query_profiler, volume_index
+    )
+    from tasks import scheduler
+    from tasks.scheduled_tasks import scan_for_fraud
+    
+    app = create_cli_app(config_class)
+    CORS(app)  # Enable CORS for all routes
     
     # Initialize extensions
     jwt_config(app)
     jwt.init_app(app)
-    init_models(app)
+    # Deliver notification emails from background workers
+    mail_queue.init_app(app)
+    # Cache JWT identity lookups, invalidated on local user/wallet changes
+    identity_cache.init_app(app)
+    # Request latency, per-request SQL counts and the /metrics endpoint
+    metrics.init_app(app)
+    # Opt-in per-request SQL report for spotting N+1s and slow statements
+    query_profiler.init_app(app)
     
     # Simple test route
     @app.route('/test')
@@ -76,15 +106,20 @@ def create_app(config_class=Config):
     with app.app_context():
         db.create_all()
 
-    # Initialize scheduler
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(scan_for_fraud, 'cron', hour=0, minute=0)  # Run at midnight
-    scheduler.start()
+    # Warm the fraud check window counters (no-op unless enabled)
+    fraud_window.init_app(app)
+    # Keep the per-wallet daily volume index updated on transaction inserts
+    volume_index.init_app(app)
+    # Write double-entry postings with each transaction (no-op unless LEDGER_ENABLED)
+    ledger.init_app(app)
+    # Batch commits of money-moving requests (no-op unless GROUP_COMMIT_ENABLED)
+    group_commit.init_app(app)
+
+    # Scheduled jobs; disable with SCHEDULER_ENABLED=false and run run_scheduler.py instead
+    scheduler.init_app(app)
     
     return app
 
-# Create the Flask application instance
-app = create_app()
-
 if __name__ == '__main__':
+    app = create_app()
     app.run(debug=True, port=5000)
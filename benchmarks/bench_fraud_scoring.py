@@ -0,0 +1,97 @@
+"""
+Benchmark batch fraud scoring against the scalar calculate_fraud_score.
+
+Usage: python benchmarks/bench_fraud_scoring.py [rows] [wallets] [parity_sample]
+
+Builds a throwaway SQLite database, scores every row with calculate_fraud_scores,
+checks parity against calculate_fraud_score on a random sample and reports the
+per-row cost of both paths. Rule boundaries are covered deterministically by
+check_fraud_scoring_parity.py.
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from flask import Flask
+from models import init_models, db
+from models.transaction import Transaction
+from models.user import User
+from models.wallet import Wallet
+from tasks.fraud_detection import calculate_fraud_score, calculate_fraud_scores, load_transaction_block
+
+def create_bench_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    init_models(app)
+    return app
+
+def populate(rows, wallets, now):
+    db.session.execute(User.__table__.insert(), [{
+        'id': 1, 'email': 'bench@example.com', 'first_name': 'Bench', 'last_name': 'User'
+    }])
+    db.session.execute(Wallet.__table__.insert(), [{'id': i, 'user_id': 1} for i in range(1, wallets + 1)])
+    
+    batch = []
+    for i in range(rows):
+        batch.append({
+            'wallet_id': random.randint(1, wallets),
+            'amount': round(random.choice([50, 800, 1500, 6000, 12000]) * random.random() * 2, 2),
+            'transaction_type': 'deposit',
+            'created_at': now - timedelta(seconds=random.randint(0, 2 * 86400)),
+        })
+        if len(batch) == 50000:
+            db.session.execute(Transaction.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(Transaction.__table__.insert(), batch)
+    db.session.commit()
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    wallets = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    sample = int(sys.argv[3]) if len(sys.argv) > 3 else 2_000
+    now = datetime.utcnow()
+    
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    app = create_bench_app(path)
+    with app.app_context():
+        db.create_all()
+        print(f"Populating {rows:,} transactions across {wallets:,} wallets...")
+        populate(rows, wallets, now)
+        
+        start = time.perf_counter()
+        block = load_transaction_block(now - timedelta(days=3))
+        load_time = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        scores = calculate_fraud_scores(block['wallet_id'], block['amount'], block['created_at'])
+        batch_time = time.perf_counter() - start
+        
+        print(f"Block load:      {load_time:8.2f}s")
+        print(f"Batch scoring:   {batch_time:8.3f}s ({batch_time / rows * 1e6:.3f} us/row)")
+        
+        # Parity and timing of the scalar path on a random sample
+        positions = random.sample(range(len(block['id'])), min(sample, len(block['id'])))
+        by_id = dict(zip(block['id'].tolist(), scores.tolist()))
+        mismatches = 0
+        start = time.perf_counter()
+        for pos in positions:
+            transaction = db.session.get(Transaction, int(block['id'][pos]))
+            if abs(calculate_fraud_score(transaction) - by_id[transaction.id]) > 1e-9:
+                mismatches += 1
+        scalar_time = time.perf_counter() - start
+        
+        print(f"Scalar scoring:  {scalar_time / len(positions) * 1e6:8.1f} us/row "
+              f"(~{scalar_time / len(positions) * rows:.0f}s projected for {rows:,} rows)")
+        print(f"Parity:          {len(positions) - mismatches}/{len(positions)} sampled scores match")
+    
+    os.remove(path)
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""
+Throughput and latency of the group-commit writer across batch windows.
+
+Usage: python benchmarks/bench_group_commit.py [threads] [transfers_per_thread] [windows_ms] [database_url]
+
+Client threads run random transfers between a few wallets, the same unit of
+work the /transfer route commits. Each window in windows_ms (comma separated,
+default inline,0,1,2,5,10) is a separate run: "inline" commits every transfer
+on its own with run_with_retry, a number routes transfers through a
+GroupCommitWriter gathering batches for that many milliseconds. Every run
+checks that balances are conserved and that one transaction row was written
+per successful transfer. Defaults to a throwaway SQLite file (the writer opens
+an explicit outer transaction there so a batch really is one commit); pass a
+Postgres URL to measure against a server that fsyncs each commit.
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+import tempfile
+import threading
+import time
+from flask import Flask
+from models import init_models, db
+from models.money import money_sum
+from models.transaction import Transaction
+from models.user import User
+from models.wallet import Wallet
+from services.balance_service import transfer, run_with_retry, InsufficientFundsError
+from services.group_commit import GroupCommitWriter
+
+INITIAL_BALANCE = 500.0
+WALLETS = 20
+
+def create_bench_app(database_url):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['BALANCE_UPDATE_RETRIES'] = 50
+    if database_url.startswith('sqlite'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30}}
+    init_models(app)
+    return app
+
+def reset(app):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(email='bench@example.com', first_name='Bench', last_name='User')
+        db.session.add(user)
+        db.session.flush()
+        for i in range(1, WALLETS + 1):
+            db.session.add(Wallet(id=i, user_id=user.id, balance=INITIAL_BALANCE))
+        db.session.commit()
+
+def make_transfer():
+    sender, receiver = random.sample(range(1, WALLETS + 1), 2)
+    amount = round(random.uniform(1, 100), 2)
+    
+    def apply():
+        transfer(sender, receiver, amount)
+        transaction = Transaction(
+            wallet_id=sender,
+            receiver_wallet_id=receiver,
+            amount=amount,
+            transaction_type='transfer'
+        )
+        db.session.add(transaction)
+        return transaction
+    return apply
+
+def worker(app, writer, transfers, latencies, stats, lock):
+    with app.app_context():
+        for _ in range(transfers):
+            apply = make_transfer()
+            start = time.perf_counter()
+            try:
+                if writer is None:
+                    run_with_retry(apply)
+                else:
+                    writer.submit(apply).result()
+                outcome = 'ok'
+            except InsufficientFundsError:
+                outcome = 'insufficient'
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                stats[outcome] += 1
+        db.session.remove()
+
+def run(app, threads, transfers, window_ms):
+    reset(app)
+    writer = None
+    if window_ms is not None:
+        writer = GroupCommitWriter(app, batch_window=window_ms / 1000.0, batch_size=threads)
+        writer.start()
+    
+    latencies = []
+    stats = {'ok': 0, 'insufficient': 0}
+    lock = threading.Lock()
+    pool = [
+        threading.Thread(target=worker, args=(app, writer, transfers, latencies, stats, lock))
+        for _ in range(threads)
+    ]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    if writer is not None:
+        writer.stop()
+    
+    with app.app_context():
+        total = money_sum(balance for (balance,) in db.session.query(Wallet.balance))
+        negative = Wallet.query.filter(Wallet.balance < 0).count()
+        recorded = Transaction.query.count()
+    
+    latencies.sort()
+    label = 'inline' if window_ms is None else f'{window_ms}ms'
+    ok = abs(total - INITIAL_BALANCE * WALLETS) < 0.005 and not negative and recorded == stats['ok']
+    print(f"{label:>7} {threads * transfers / elapsed:8.0f} transfers/s  "
+          f"p50 {latencies[len(latencies) // 2] * 1000:7.2f}ms  "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:7.2f}ms  "
+          f"rejected {stats['insufficient']:4d}  {'OK' if ok else 'NOT CONSERVED'}")
+    return ok
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    transfers = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    windows = (sys.argv[3] if len(sys.argv) > 3 else 'inline,0,1,2,5,10').split(',')
+    database_url = sys.argv[4] if len(sys.argv) > 4 else \
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'group_commit.db')}"
+    
+    app = create_bench_app(database_url)
+    print(f"{threads} threads x {transfers} transfers over {WALLETS} wallets")
+    results = [
+        run(app, threads, transfers, None if window == 'inline' else float(window))
+        for window in windows
+    ]
+    if not all(results):
+        print("FAILED: balances were not conserved")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark /api/auth/login throughput with inline and pooled bcrypt hashing.
+
+Usage: python benchmarks/bench_login_throughput.py [threads] [logins_per_thread] [rounds]
+
+Creates the app against a throwaway SQLite database, registers one user and
+drives the login endpoint from concurrent threads, first hashing inline on the
+request thread and then through the password hashing process pool.
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+import threading
+import time
+
+os.environ.setdefault('SECRET_KEY', 'bench-secret-key')
+os.environ.setdefault('JWT_SECRET_KEY', 'bench-jwt-secret-key-with-enough-length')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+os.environ.setdefault('MAIL_QUEUE_ENABLED', 'false')
+os.environ.setdefault('SCHEDULER_ENABLED', 'false')
+
+from app import create_app
+from models import db
+from models.user import User
+from services import password_hasher
+
+def drive_logins(app, threads, logins):
+    errors = []
+    
+    def worker():
+        client = app.test_client()
+        for _ in range(logins):
+            response = client.post('/api/auth/login', json={'email': 'bench@example.com', 'password': 'bench-password'})
+            if response.status_code != 200:
+                errors.append(response.status_code)
+    
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return threads * logins / elapsed, errors
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    logins = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    rounds = int(sys.argv[3]) if len(sys.argv) > 3 else 12
+    
+    app = create_app()
+    app.config['BCRYPT_LOG_ROUNDS'] = rounds
+    app.config['PASSWORD_HASH_WORKERS'] = 0
+    with app.app_context():
+        db.session.add(User(email='bench@example.com', password='bench-password'))
+        db.session.commit()
+    
+    print(f"{threads} threads x {logins} logins, bcrypt cost {rounds}, {os.cpu_count()} CPUs")
+    for workers in (0, os.cpu_count() or 1):
+        app.config['PASSWORD_HASH_WORKERS'] = workers
+        password_hasher.shutdown()
+        drive_logins(app, 1, 1)  # Warm up the pool
+        rate, errors = drive_logins(app, threads, logins)
+        mode = 'inline' if workers == 0 else f'pool of {workers}'
+        print(f"  {mode:<12} {rate:8.1f} logins/s{'  errors: %d' % len(errors) if errors else ''}")
+    
+    # A changed work factor is picked up transparently on the next login
+    app.config['BCRYPT_LOG_ROUNDS'] = rounds - 1
+    drive_logins(app, 1, 1)
+    with app.app_context():
+        user = User.query.filter_by(email='bench@example.com').first()
+        print(f"  rehashed on login: cost {rounds} -> {password_hasher.hash_rounds(user.password_hash)}")
+    password_hasher.shutdown()
+
+if __name__ == '__main__':
+    main()
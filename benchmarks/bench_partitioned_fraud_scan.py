@@ -0,0 +1,87 @@
+"""
+Benchmark the partitioned daily fraud scan across 1/2/4/8 worker processes.
+
+Usage: python benchmarks/bench_partitioned_fraud_scan.py [rows] [wallets] [database_url]
+
+Populates a throwaway SQLite database (or the given database URL, which must be
+empty), then scores the last day with the single-process scan and with
+partitioned_scan at each worker count. Flags are reset between runs, and every
+run must flag the same transactions as the single-process baseline.
+SQLite serializes writers, so run it against PostgreSQL for representative scaling.
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+import time
+from datetime import datetime, timedelta
+from flask import Flask
+from sqlalchemy import update
+from models import init_models, db
+from models.transaction import Transaction
+from tasks.fraud_detection import scan_block
+from tasks.fraud_partitions import partitioned_scan
+from bench_fraud_scoring import populate
+
+WORKER_COUNTS = (1, 2, 4, 8)
+
+def create_bench_app(uri):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    init_models(app)
+    return app
+
+def reset_flags():
+    db.session.execute(update(Transaction).values(fraud_score=0.0, is_suspicious=False))
+    db.session.commit()
+
+def flagged_ids():
+    return {row.id for row in db.session.query(Transaction.id).filter(Transaction.is_suspicious == True)}
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    wallets = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    path = None
+    if len(sys.argv) > 3:
+        uri = sys.argv[3]
+    else:
+        path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+        uri = f'sqlite:///{path}'
+    now = datetime.utcnow()
+    since = now - timedelta(days=1)
+    
+    app = create_bench_app(uri)
+    failed = False
+    with app.app_context():
+        db.create_all()
+        print(f"Populating {rows:,} transactions across {wallets:,} wallets...")
+        populate(rows, wallets, now)
+        
+        reset_flags()
+        start = time.perf_counter()
+        baseline = scan_block(since)
+        print(f"single process:   {time.perf_counter() - start:8.2f}s "
+              f"({baseline['scanned']:,} scanned, {baseline['suspicious']:,} suspicious)")
+        expected = flagged_ids()
+        
+        for workers in WORKER_COUNTS:
+            reset_flags()
+            db.engine.dispose()  # Don't hand pooled connections to forked workers
+            start = time.perf_counter()
+            summary = partitioned_scan(since, workers, shards=workers, database_uri=uri)
+            elapsed = time.perf_counter() - start
+            db.session.expire_all()
+            match = flagged_ids() == expected and summary['scanned'] == baseline['scanned']
+            failed |= not match
+            slowest = max(s['seconds'] for s in summary['per_shard'])
+            print(f"{workers} worker(s):      {elapsed:8.2f}s (slowest shard {slowest:.2f}s, "
+                  f"{summary['suspicious']:,} suspicious, parity {'ok' if match else 'MISMATCH'})")
+    
+    if path:
+        os.remove(path)
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Contention benchmark for sharded hot-wallet balances.
+
+Usage: python benchmarks/bench_sharded_wallet.py [threads] [transfers_per_thread] [shard_counts] [database_url]
+
+Every thread owns a payer wallet and transfers into the same merchant wallet,
+so without sharding all of them queue on the merchant's row lock. The run is
+repeated for each shard count (comma separated, default 0,1,2,4,8,16; 0 means
+unsharded), then the shards are consolidated and the total balance is checked
+for conservation. SQLite serializes all writers regardless of row locks, so
+pass a Postgres URL to see the effect of sharding.
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+import tempfile
+import threading
+import time
+from flask import Flask
+from models import init_models, db
+from models.money import money_sum
+from models import transaction  # noqa: F401  (ledger_entry references its table)
+from models.user import User
+from models.wallet import Wallet
+from models.wallet_shard import WalletShard
+from services import wallet_shards
+from services.balance_service import transfer, run_with_retry
+
+PAYER_BALANCE = 1000000.0
+MERCHANT_ID = 1
+
+def create_bench_app(database_url):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['WALLET_SHARDING_ENABLED'] = True
+    app.config['BALANCE_UPDATE_RETRIES'] = 50
+    if database_url.startswith('sqlite'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30}}
+    init_models(app)
+    return app
+
+def reset(app, threads, shards):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(email='merchant@example.com', first_name='Bench', last_name='Merchant')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Wallet(id=MERCHANT_ID, user_id=user.id, balance=0))
+        for i in range(threads):
+            db.session.add(Wallet(id=MERCHANT_ID + 1 + i, user_id=user.id, balance=PAYER_BALANCE))
+        db.session.commit()
+        wallet_shards.set_shards(MERCHANT_ID, shards)
+
+def worker(app, payer_id, transfers, latencies):
+    with app.app_context():
+        for _ in range(transfers):
+            amount = round(random.uniform(1, 50), 2)
+            start = time.perf_counter()
+            run_with_retry(lambda: transfer(payer_id, MERCHANT_ID, amount))
+            latencies.append(time.perf_counter() - start)
+        db.session.remove()
+
+def run(app, threads, transfers, shards):
+    reset(app, threads, shards)
+    latencies = []
+    pool = [
+        threading.Thread(target=worker, args=(app, MERCHANT_ID + 1 + i, transfers, latencies))
+        for i in range(threads)
+    ]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    
+    with app.app_context():
+        before = wallet_shards.get_balance(MERCHANT_ID)
+        wallet_shards.consolidate()
+        merchant = db.session.get(Wallet, MERCHANT_ID).balance
+        leftover = money_sum(s.balance for s in WalletShard.query.filter_by(wallet_id=MERCHANT_ID))
+        payers = money_sum(w.balance for w in Wallet.query.filter(Wallet.id != MERCHANT_ID))
+    
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    conserved = (
+        abs(merchant - before) < 0.005 and leftover == 0
+        and abs(merchant + payers - PAYER_BALANCE * threads) < 0.005
+    )
+    print(f"shards={shards:<3} {threads * transfers / elapsed:8.0f} transfers/s  "
+          f"p50 {latencies[len(latencies) // 2] * 1000:7.2f}ms  p99 {p99 * 1000:7.2f}ms  "
+          f"merchant {merchant:.2f}  {'OK' if conserved else 'NOT CONSERVED'}")
+    return conserved
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    transfers = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    shard_counts = [int(n) for n in (sys.argv[3] if len(sys.argv) > 3 else '0,1,2,4,8,16').split(',')]
+    database_url = sys.argv[4] if len(sys.argv) > 4 else \
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'shards.db')}"
+    
+    app = create_bench_app(database_url)
+    print(f"{threads} threads x {transfers} transfers into one merchant wallet")
+    results = [run(app, threads, transfers, shards) for shards in shard_counts]
+    if not all(results):
+        print("FAILED: balances were not conserved")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
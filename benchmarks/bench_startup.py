@@ -0,0 +1,57 @@
+"""
+Benchmark import and startup time of the web app and the CLI app.
+
+Usage: python benchmarks/bench_startup.py [runs]
+
+Each measurement runs in a fresh interpreter against a throwaway SQLite
+database, so module import costs are paid every time, as in a CLI invocation.
+Reports the median time to import app.py, to build create_cli_app() and to
+build the full create_app().
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = '''
+import time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+instance = getattr(app, FACTORY)()
+built = time.perf_counter()
+print(imported - start, built - imported)
+'''
+
+def measure(factory, env):
+    output = subprocess.run(
+        [sys.executable, '-c', f'FACTORY = {factory!r}' + PROBE],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout.split()
+    return float(output[-2]), float(output[-1])
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    workdir = tempfile.mkdtemp()
+    env = dict(
+        os.environ,
+        SECRET_KEY='bench-secret-key',
+        JWT_SECRET_KEY='bench-jwt-secret-key-with-enough-length',
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        SCHEDULER_ENABLED='false'
+    )
+    # Warm the bytecode cache and create the schema once
+    measure('create_app', env)
+    
+    for factory in ('create_cli_app', 'create_app'):
+        samples = [measure(factory, env) for _ in range(runs)]
+        import_time = statistics.median(s[0] for s in samples)
+        build_time = statistics.median(s[1] for s in samples)
+        print(f"{factory:<15} import {import_time * 1000:7.1f}ms  build {build_time * 1000:7.1f}ms  "
+              f"total {(import_time + build_time) * 1000:7.1f}ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark top-users-by-volume: raw OR-join GROUP BY versus the daily volume index.
+
+Usage: python benchmarks/bench_top_users_volume.py [rows] [users] [history_days]
+
+Builds a throwaway SQLite database, backfills wallet_daily_volume and times both
+paths for several windows, checking that they return the same ranking.
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from flask import Flask
+from models import init_models, db
+from models.transaction import Transaction
+from models.user import User
+from models.wallet import Wallet
+from routes.admin import top_users_by_volume_raw
+from services import volume_index
+
+def create_bench_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    init_models(app)
+    return app
+
+def populate(rows, users, history_days, now):
+    db.session.execute(User.__table__.insert(), [{
+        'id': i, 'email': f'user{i}@example.com', 'first_name': 'Bench', 'last_name': str(i), 'is_active': True
+    } for i in range(1, users + 1)])
+    db.session.execute(Wallet.__table__.insert(), [{'id': i, 'user_id': i} for i in range(1, users + 1)])
+    
+    batch = []
+    for _ in range(rows):
+        is_transfer = random.random() < 0.5
+        batch.append({
+            'wallet_id': random.randint(1, users),
+            'receiver_wallet_id': random.randint(1, users) if is_transfer else None,
+            'amount': round(random.expovariate(1 / 300), 2),
+            'transaction_type': 'transfer' if is_transfer else 'deposit',
+            'created_at': now - timedelta(seconds=random.randint(0, history_days * 86400)),
+        })
+        if len(batch) == 50000:
+            db.session.execute(Transaction.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(Transaction.__table__.insert(), batch)
+    db.session.commit()
+
+def timed(fn, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(timings)
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+    history_days = int(sys.argv[3]) if len(sys.argv) > 3 else 365
+    now = datetime.utcnow()
+    
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    app = create_bench_app(path)
+    with app.app_context():
+        db.create_all()
+        print(f"Populating {rows:,} transactions for {users:,} users over {history_days} days...")
+        populate(rows, users, history_days, now)
+        
+        start = time.perf_counter()
+        index_rows = volume_index.backfill()
+        print(f"Backfilled {index_rows:,} index rows in {time.perf_counter() - start:.1f}s\n")
+        
+        print(f"{'days':>6} {'raw ms':>10} {'index ms':>10}  same ranking")
+        for days in (1, 7, 30, 90, 365):
+            query_now = datetime.utcnow()
+            raw, raw_ms = timed(lambda: top_users_by_volume_raw(10, days, query_now))
+            indexed, index_ms = timed(lambda: volume_index.top_users_by_volume(10, days, query_now))
+            # Compare volumes rather than ids so ties in either order still match
+            same = [round(r['total_volume'], 6) for r in raw] == [round(r['total_volume'], 6) for r in indexed]
+            print(f"{days:>6} {raw_ms:>10.1f} {index_ms:>10.1f}  {same}")
+    
+    os.remove(path)
+
+if __name__ == '__main__':
+    main()
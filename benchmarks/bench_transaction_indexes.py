@@ -0,0 +1,124 @@
+"""
+Benchmark the Transaction query shapes with and without the composite indexes.
+
+Usage: python benchmarks/bench_transaction_indexes.py [rows] [wallets]
+
+Builds a throwaway SQLite database, prints the query plan and median latency of
+each query before and after the indexes from models/transaction.py are created.
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, text
+from models import db
+from models.transaction import Transaction
+from models.user import User
+from models.wallet import Wallet
+
+QUERIES = {
+    'check_fraud recent count': (
+        'SELECT count(*) FROM "transaction" WHERE wallet_id = :wallet_id AND created_at >= :hour_ago'
+    ),
+    'check_fraud daily sum': (
+        'SELECT sum(amount) FROM "transaction" WHERE wallet_id = :wallet_id AND created_at >= :day_ago'
+    ),
+    'fraud score large count': (
+        'SELECT count(*) FROM "transaction" WHERE wallet_id = :wallet_id AND amount > 1000 '
+        'AND created_at >= :day_ago'
+    ),
+    'history page': (
+        'SELECT * FROM "transaction" WHERE wallet_id = :wallet_id OR receiver_wallet_id = :wallet_id '
+        'ORDER BY created_at DESC, id DESC LIMIT 50'
+    ),
+    'daily scan window': (
+        'SELECT count(*) FROM "transaction" WHERE created_at >= :day_ago'
+    ),
+    'suspicious list': (
+        'SELECT * FROM "transaction" WHERE is_suspicious = 1 ORDER BY created_at DESC LIMIT 100'
+    ),
+}
+
+def populate(conn, rows, wallets, now):
+    conn.execute(text('INSERT INTO "user" (id, email, first_name, last_name) VALUES (1, :e, :f, :l)'),
+                 {'e': 'bench@example.com', 'f': 'Bench', 'l': 'User'})
+    conn.execute(text('INSERT INTO wallet (id, user_id, balance) VALUES (:id, 1, 0)'),
+                 [{'id': i} for i in range(1, wallets + 1)])
+    
+    batch = []
+    for i in range(rows):
+        created_at = now - timedelta(seconds=random.randint(0, 90 * 86400))
+        is_transfer = random.random() < 0.4
+        batch.append({
+            'wallet_id': random.randint(1, wallets),
+            'receiver_wallet_id': random.randint(1, wallets) if is_transfer else None,
+            'amount': round(random.expovariate(1 / 500), 2),
+            'transaction_type': 'transfer' if is_transfer else 'deposit',
+            'is_suspicious': random.random() < 0.01,
+            'created_at': created_at,
+        })
+        if len(batch) == 50000:
+            conn.execute(Transaction.__table__.insert(), batch)
+            batch = []
+    if batch:
+        conn.execute(Transaction.__table__.insert(), batch)
+    conn.commit()
+
+def run_queries(conn, params, repeat=20):
+    for name, sql in QUERIES.items():
+        plan = conn.execute(text('EXPLAIN QUERY PLAN ' + sql), params).fetchall()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            conn.execute(text(sql), params).fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"  {name:<28} {statistics.median(timings):>9.3f} ms")
+        for row in plan:
+            print(f"      {row[-1]}")
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    wallets = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    now = datetime.utcnow()
+    params = {
+        'wallet_id': 42,
+        'hour_ago': now - timedelta(hours=1),
+        'day_ago': now - timedelta(days=1),
+    }
+    
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    engine = create_engine(f'sqlite:///{path}')
+    db.metadata.create_all(engine)
+    
+    with engine.connect() as conn:
+        for index in Transaction.__table__.indexes:
+            index.drop(conn)
+        conn.commit()
+        
+        print(f"Populating {rows:,} transactions across {wallets:,} wallets...")
+        start = time.perf_counter()
+        populate(conn, rows, wallets, now)
+        print(f"Populated in {time.perf_counter() - start:.1f}s\n")
+        
+        print("Without indexes:")
+        run_queries(conn, params)
+        
+        start = time.perf_counter()
+        for index in Transaction.__table__.indexes:
+            index.create(conn)
+        conn.execute(text('ANALYZE'))
+        conn.commit()
+        print(f"\nBuilt indexes in {time.perf_counter() - start:.1f}s\n")
+        
+        print("With indexes:")
+        run_queries(conn, params)
+    
+    os.remove(path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Deterministic parity check of calculate_fraud_scores against calculate_fraud_score.
+
+Usage: python benchmarks/check_fraud_scoring_parity.py
+
+Scores a small hand-built block in an in-memory SQLite database with both the
+vectorized and the scalar function and exits non-zero on any mismatch. The
+rows sit on the rule boundaries the random sample in bench_fraud_scoring.py is
+unlikely to hit: amounts exactly at 1000, 5000 and 10000, the 23:00 and 05:00
+hour edges, a lone large row that must not count itself, rows exactly 24 hours
+apart, and several wallets interleaved in one block.
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime, timedelta
+from flask import Flask
+from models import init_models, db
+from models.transaction import Transaction
+from models.user import User
+from models.wallet import Wallet
+from tasks.fraud_detection import calculate_fraud_score, calculate_fraud_scores, load_transaction_block
+
+DAY = datetime(2024, 1, 10)
+
+# (case, wallet_id, amount, created_at)
+CASES = [
+    # Amount thresholds are strict: exactly 1000/5000/10000 do not count
+    ('amount 1000.00', 1, 1000.00, DAY + timedelta(hours=12)),
+    ('amount 1000.01', 1, 1000.01, DAY + timedelta(hours=12, minutes=1)),
+    ('amount 5000.00', 1, 5000.00, DAY + timedelta(hours=12, minutes=2)),
+    ('amount 5000.01', 1, 5000.01, DAY + timedelta(hours=12, minutes=3)),
+    ('amount 10000.00', 1, 10000.00, DAY + timedelta(hours=12, minutes=4)),
+    ('amount 10000.01', 1, 10000.01, DAY + timedelta(hours=12, minutes=5)),
+    # Night-time window is [23:00, 05:00)
+    ('hour 22:59:59.999999', 2, 50.00, DAY + timedelta(hours=23) - timedelta(microseconds=1)),
+    ('hour 23:00:00', 2, 50.00, DAY + timedelta(hours=23)),
+    ('hour 04:59:59.999999', 2, 50.00, DAY + timedelta(days=1, hours=5) - timedelta(microseconds=1)),
+    ('hour 05:00:00', 2, 50.00, DAY + timedelta(days=1, hours=5)),
+    # A single large row must not count itself as recent large activity
+    ('lone large row', 3, 7500.00, DAY + timedelta(hours=9)),
+    # Look-back starts exactly 24 hours before each row (inclusive); the scalar query has
+    # no upper bound, so the first row of each pair also sees the second
+    ('24h apart: first', 4, 2000.00, DAY + timedelta(hours=8)),
+    ('24h apart: second', 4, 2000.00, DAY + timedelta(days=1, hours=8)),
+    ('24h + 1us apart: first', 7, 2000.00, DAY + timedelta(hours=8)),
+    ('24h + 1us apart: second', 7, 2000.00, DAY + timedelta(days=1, hours=8, microseconds=1)),
+    # Three or more large rows in the window, interleaved with other wallets
+    ('burst 1', 5, 1500.00, DAY + timedelta(hours=14)),
+    ('burst 2', 6, 1500.00, DAY + timedelta(hours=14, seconds=1)),
+    ('burst 3', 5, 1500.00, DAY + timedelta(hours=15)),
+    ('burst 4', 6, 999.99, DAY + timedelta(hours=15, seconds=1)),
+    ('burst 5', 5, 12000.00, DAY + timedelta(hours=23, minutes=30)),
+    ('burst 6', 5, 1500.00, DAY + timedelta(days=1, hours=1)),
+    ('burst 7', 6, 1500.00, DAY + timedelta(days=1, hours=2)),
+]
+
+def create_check_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    init_models(app)
+    return app
+
+def main():
+    app = create_check_app()
+    with app.app_context():
+        db.create_all()
+        db.session.execute(User.__table__.insert(), [{
+            'id': 1, 'email': 'parity@example.com', 'first_name': 'Parity', 'last_name': 'Check'
+        }])
+        wallet_ids = sorted({wallet_id for _, wallet_id, _, _ in CASES})
+        db.session.execute(Wallet.__table__.insert(), [{'id': i, 'user_id': 1} for i in wallet_ids])
+        db.session.execute(Transaction.__table__.insert(), [
+            {'id': i, 'wallet_id': wallet_id, 'amount': amount, 'transaction_type': 'deposit', 'created_at': created_at}
+            for i, (_, wallet_id, amount, created_at) in enumerate(CASES, start=1)
+        ])
+        db.session.commit()
+        
+        block = load_transaction_block(DAY - timedelta(days=1))
+        scores = dict(zip(block['id'].tolist(),
+                          calculate_fraud_scores(block['wallet_id'], block['amount'], block['created_at']).tolist()))
+        
+        mismatches = 0
+        for i, (case, *_) in enumerate(CASES, start=1):
+            expected = calculate_fraud_score(db.session.get(Transaction, i))
+            actual = scores[i]
+            ok = abs(expected - actual) <= 1e-9
+            mismatches += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {case:<26} scalar {expected:.2f}  batch {actual:.2f}")
+    
+    print(f"{len(CASES) - mismatches}/{len(CASES)} scores match")
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Multi-threaded stress test for atomic balance updates.
+
+Usage: python benchmarks/stress_concurrent_transfers.py [threads] [transfers_per_thread] [wallets] [database_url]
+
+Runs random transfers between a small set of wallets from many threads at once
+through services.balance_service and verifies that the sum of balances is
+conserved and that no wallet goes negative. Defaults to a throwaway SQLite file;
+pass a Postgres URL to exercise row locks and deadlock retries.
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+import tempfile
+import threading
+import time
+from flask import Flask
+from sqlalchemy import func
+from models import init_models, db
+from models.transaction import Transaction
+from models.user import User
+from models.wallet import Wallet
+from services.balance_service import transfer, run_with_retry, InsufficientFundsError
+
+INITIAL_BALANCE = 1000.0
+stats_lock = threading.Lock()
+
+def create_stress_app(database_url):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['BALANCE_UPDATE_RETRIES'] = 50
+    if database_url.startswith('sqlite'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30}}
+    init_models(app)
+    return app
+
+def worker(app, wallets, transfers, stats):
+    with app.app_context():
+        for _ in range(transfers):
+            sender, receiver = random.sample(range(1, wallets + 1), 2)
+            amount = round(random.uniform(1, 200), 2)
+            
+            def apply():
+                transfer(sender, receiver, amount)
+                db.session.add(Transaction(
+                    wallet_id=sender,
+                    receiver_wallet_id=receiver,
+                    amount=amount,
+                    transaction_type='transfer'
+                ))
+            
+            try:
+                run_with_retry(apply)
+                outcome = 'ok'
+            except InsufficientFundsError:
+                outcome = 'insufficient'
+            with stats_lock:
+                stats[outcome] += 1
+        db.session.remove()
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    transfers = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    wallets = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    database_url = sys.argv[4] if len(sys.argv) > 4 else \
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'stress.db')}"
+    
+    app = create_stress_app(database_url)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(email='stress@example.com', first_name='Stress', last_name='User')
+        db.session.add(user)
+        db.session.flush()
+        for i in range(1, wallets + 1):
+            db.session.add(Wallet(id=i, user_id=user.id, balance=INITIAL_BALANCE))
+        db.session.commit()
+    
+    stats = {'ok': 0, 'insufficient': 0}
+    pool = [threading.Thread(target=worker, args=(app, wallets, transfers, stats)) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    
+    with app.app_context():
+        total = db.session.query(func.sum(Wallet.balance)).scalar()
+        negative = Wallet.query.filter(Wallet.balance < 0).count()
+        recorded = Transaction.query.count()
+    
+    expected = INITIAL_BALANCE * wallets
+    print(f"{threads} threads x {transfers} transfers over {wallets} wallets in {elapsed:.2f}s "
+          f"({threads * transfers / elapsed:.0f} transfers/s)")
+    print(f"Completed: {stats['ok']}, rejected for insufficient funds: {stats['insufficient']}, "
+          f"transactions recorded: {recorded}")
+    print(f"Total balance: {total:.2f} (expected {expected:.2f}), negative wallets: {negative}")
+    
+    if abs(total - expected) > 1e-6 or negative or recorded != stats['ok']:
+        print("FAILED: balances were not conserved")
+        sys.exit(1)
+    print("OK: balances conserved")
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,10 @@
 from flask import Flask
 from models import db
 from models.user import User
-from app import create_app
+from app import create_cli_app
 
 def list_users():
-    app = create_app()
+    app = create_cli_app()
     with app.app_context():
         users = User.query.all()
         print("\nRegistered Users:")
@@ -6,11 +6,31 @@ load_dotenv()
 
 import logging
 from logging.handlers import RotatingFileHandler
+from services.pool_metrics import is_memory_sqlite
+
+def engine_options(database_uri):
+    """SQLAlchemy engine/pool options from the environment"""
+    options = {
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true',
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),  # Seconds
+    }
+    # In-memory SQLite uses a single static connection; pool sizing does not apply
+    if not is_memory_sqlite(database_uri):
+        options.update({
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+            'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),  # Seconds to wait for a connection
+        })
+    statement_timeout = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 0))
+    if statement_timeout and database_uri.startswith('postgresql'):
+        options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout}'}
+    return options
 
 class Config:
     SECRET_KEY = os.environ['SECRET_KEY']
     SQLALCHEMY_DATABASE_URI = os.environ['DATABASE_URL']
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
     JWT_SECRET_KEY = os.environ['JWT_SECRET_KEY']
     
     @staticmethod
@@ -30,14 +50,96 @@ class Config:
     JWT_HEADER_NAME = 'Authorization'
     JWT_HEADER_TYPE = 'Bearer'
     
+    # Password hashing: bcrypt work factor and size of the hashing process pool
+    # (0 hashes inline on the request thread)
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+    
+    # Process-wide cache of JWT identity -> user/wallet records
+    IDENTITY_CACHE_ENABLED = os.environ.get('IDENTITY_CACHE_ENABLED', 'true').lower() == 'true'
+    IDENTITY_CACHE_TTL = int(os.environ.get('IDENTITY_CACHE_TTL', 60))  # Seconds
+    IDENTITY_CACHE_SIZE = int(os.environ.get('IDENTITY_CACHE_SIZE', 10000))
+    
     # Fraud Detection Settings
     MAX_TRANSFERS_PER_HOUR = 10
     SUSPICIOUS_AMOUNT_THRESHOLD = 10000
     MAX_DAILY_TRANSFER_AMOUNT = 50000
+    # Serve check_fraud from in-process sliding-window counters instead of SQL.
+    # Only exact with a single writer process unless a shared backend is plugged in.
+    FRAUD_WINDOW_ENABLED = os.environ.get('FRAUD_WINDOW_ENABLED', 'false').lower() == 'true'
+    
+    # Daily fraud scan parallelism: >1 shards transactions by wallet across worker processes
+    FRAUD_SCAN_WORKERS = int(os.environ.get('FRAUD_SCAN_WORKERS', 1))
+    FRAUD_SCAN_SHARDS = int(os.environ.get('FRAUD_SCAN_SHARDS', 0))  # 0 means one shard per worker
+    
+    # Double-entry ledger: balances derived from snapshots plus newer ledger entries.
+    # Run `python ledger_admin.py open` with writes stopped before enabling.
+    LEDGER_ENABLED = os.environ.get('LEDGER_ENABLED', 'false').lower() == 'true'
+    LEDGER_SNAPSHOT_INTERVAL = int(os.environ.get('LEDGER_SNAPSHOT_INTERVAL', 15))  # Minutes between snapshot jobs
+    LEDGER_SNAPSHOT_LAG = int(os.environ.get('LEDGER_SNAPSHOT_LAG', 60))  # Seconds an entry stays in the tail before snapshots fold it
+    
+    # Sharded sub-balances for hot wallets, enabled per wallet via PUT /api/admin/wallets/<id>/shards
+    WALLET_SHARDING_ENABLED = os.environ.get('WALLET_SHARDING_ENABLED', 'false').lower() == 'true'
+    WALLET_SHARD_CONSOLIDATE_INTERVAL = int(os.environ.get('WALLET_SHARD_CONSOLIDATE_INTERVAL', 5))  # Minutes
+    
+    # Idempotency-Key responses for deposit, withdraw and transfer
+    IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL', 86400))  # Seconds a key and its stored response are kept
+    IDEMPOTENCY_LOCK_TIMEOUT = int(os.environ.get('IDEMPOTENCY_LOCK_TIMEOUT', 60))  # Seconds before an unfinished claim can be retaken
+    
+    # Group commit: deposits, withdrawals and transfers are committed in batches by one writer
+    # thread per process, trading up to GROUP_COMMIT_WINDOW seconds of latency for fewer commits
+    GROUP_COMMIT_ENABLED = os.environ.get('GROUP_COMMIT_ENABLED', 'false').lower() == 'true'
+    GROUP_COMMIT_WINDOW = float(os.environ.get('GROUP_COMMIT_WINDOW', 0.005))  # Seconds to gather a batch
+    GROUP_COMMIT_MAX_BATCH = int(os.environ.get('GROUP_COMMIT_MAX_BATCH', 100))
+    
+    # Retries for balance updates that hit deadlocks or serialization failures
+    BALANCE_UPDATE_RETRIES = int(os.environ.get('BALANCE_UPDATE_RETRIES', 5))
+    BALANCE_UPDATE_RETRY_BACKOFF = 0.01
+    
+    # Batch transfers
+    BATCH_TRANSFER_MAX_ITEMS = int(os.environ.get('BATCH_TRANSFER_MAX_ITEMS', 10000))
+    BATCH_TRANSFER_CHUNK_SIZE = int(os.environ.get('BATCH_TRANSFER_CHUNK_SIZE', 500))
+    
+    # Hourly transaction rollups: recent hours are re-rolled on every compaction
+    # because fraud scans can still change their suspicious flags
+    ROLLUP_RESETTLE_HOURS = int(os.environ.get('ROLLUP_RESETTLE_HOURS', 48))
+    
+    # Scheduled jobs: set SCHEDULER_ENABLED=false in web workers and run run_scheduler.py
+    SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', 'true').lower() == 'true'
+    SCHEDULER_METRICS_PORT = int(os.environ.get('SCHEDULER_METRICS_PORT', 9102))  # /metrics of run_scheduler.py; 0 disables
+    SCHEDULER_LOCK_TTL = int(os.environ.get('SCHEDULER_LOCK_TTL', 3600))  # Max seconds a job's lease is held (capped below its period)
+    
+    # Directory for background transaction exports; must be shared by all web workers
+    EXPORT_DIR = os.environ.get('EXPORT_DIR', 'exports')
+    EXPORT_TTL = int(os.environ.get('EXPORT_TTL', 86400))  # Seconds before export jobs and files are deleted
+    
+    # Transaction history pagination
+    TRANSACTIONS_PAGE_SIZE = int(os.environ.get('TRANSACTIONS_PAGE_SIZE', 50))
+    TRANSACTIONS_MAX_PAGE_SIZE = int(os.environ.get('TRANSACTIONS_MAX_PAGE_SIZE', 500))
+    TRANSACTIONS_STREAM_BATCH_SIZE = 1000
     
     # Email Settings (for mock notifications)
-    MAIL_SERVER = 'smtp.example.com'
-    MAIL_PORT = 587
+    MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.example.com')
+    MAIL_PORT = int(os.environ.get('MAIL_PORT', 587))
     MAIL_USE_TLS = True
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
+    MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER')
+    # log (mock), smtp, or memory (in-process fake sink for tests)
+    MAIL_BACKEND = os.environ.get('MAIL_BACKEND', 'log')
+    
+    # Outbound mail queue
+    MAIL_QUEUE_ENABLED = os.environ.get('MAIL_QUEUE_ENABLED', 'true').lower() == 'true'
+    MAIL_QUEUE_WORKERS = int(os.environ.get('MAIL_QUEUE_WORKERS', 2))
+    MAIL_QUEUE_BATCH_WINDOW = float(os.environ.get('MAIL_QUEUE_BATCH_WINDOW', 0.5))  # Seconds to coalesce alerts
+    MAIL_QUEUE_MAX_RETRIES = int(os.environ.get('MAIL_QUEUE_MAX_RETRIES', 5))
+    MAIL_QUEUE_RETRY_BACKOFF = 1.0
+    
+    # Prometheus-style /metrics endpoint and request instrumentation
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    
+    # Slow-query / N+1 detector (development and canary only)
+    QUERY_PROFILER_ENABLED = os.environ.get('QUERY_PROFILER_ENABLED', 'false').lower() == 'true'
+    QUERY_PROFILER_REPEAT_THRESHOLD = int(os.environ.get('QUERY_PROFILER_REPEAT_THRESHOLD', 5))  # Same shape more often than this is flagged
+    QUERY_PROFILER_SLOW_MS = float(os.environ.get('QUERY_PROFILER_SLOW_MS', 100))
+    QUERY_PROFILER_HEADER = os.environ.get('QUERY_PROFILER_HEADER', 'true').lower() == 'true'
@@ -139,6 +139,8 @@ const Admin = () => {
   const [topUsersByVolume, setTopUsersByVolume] = useState<TopUserVolume[]>([]);
   const [suspiciousTransactions, setSuspiciousTransactions] = useState<SuspiciousTransaction[]>([]);
   const [transactions, setTransactions] = useState<Transaction[]>([]);
+  const [transactionsCursor, setTransactionsCursor] = useState<string | null>(null);
+  const [loadingMoreTransactions, setLoadingMoreTransactions] = useState(false);
   const [scanResult, setScanResult] = useState<FraudScanResult | null>(null);
   const [transactionFilter, setTransactionFilter] = useState<'all' | 'suspicious'>('all');
 
@@ -189,11 +191,21 @@ const Admin = () => {
     setActionLoading(true);
     try {
       console.log('Fetching user balances...');
-      const response = await apiCall<{user_balances: UserBalance[], total_system_balance: number}>('/admin/balances');
+      // The endpoint is paginated; follow next_cursor until every page is loaded
+      const balances: UserBalance[] = [];
+      let cursor: number | null = null;
+      let response;
+      do {
+        const query = cursor === null ? '?limit=1000' : `?limit=1000&cursor=${cursor}`;
+        response = await apiCall<{user_balances: UserBalance[], total_system_balance: number, next_cursor: number | null}>(`/admin/balances${query}`);
+        if (!response.data) break;
+        balances.push(...(response.data.user_balances || []));
+        cursor = response.data.next_cursor;
+      } while (cursor !== null);
       console.log('User balances response:', response);
       
       if (response.data) {
-        setUserBalances(response.data.user_balances || []);
+        setUserBalances(balances);
       } else {
         console.error('User balances fetch error:', response.error);
         toast({
@@ -329,11 +341,12 @@ const Admin = () => {
     setActionLoading(true);
     try {
       console.log('Fetching transactions...');
-      const response = await apiCall<{transactions: Transaction[]}>('/wallet/transactions');
+      const response = await apiCall<{transactions: Transaction[], next_cursor: string | null}>('/wallet/transactions');
       console.log('Transactions response:', response);
       
       if (response.data) {
         setTransactions(response.data.transactions || []);
+        setTransactionsCursor(response.data.next_cursor);
       } else {
         console.error('Transactions fetch error:', response.error);
         toast({
@@ -356,6 +369,36 @@ const Admin = () => {
     }
   };
 
+  const loadMoreTransactions = async () => {
+    if (!transactionsCursor) return;
+    setLoadingMoreTransactions(true);
+    try {
+      const response = await apiCall<{transactions: Transaction[], next_cursor: string | null}>(
+        `/wallet/transactions?cursor=${encodeURIComponent(transactionsCursor)}`
+      );
+      if (response.data) {
+        const page = response.data.transactions || [];
+        setTransactions(previous => [...previous, ...page]);
+        setTransactionsCursor(response.data.next_cursor);
+      } else {
+        toast({
+          title: "Error",
+          description: response.error || "Failed to fetch transactions.",
+          variant: "destructive",
+        });
+      }
+    } catch (error) {
+      console.error('Transactions fetch exception:', error);
+      toast({
+        title: "Error",
+        description: "Failed to fetch transactions.",
+        variant: "destructive",
+      });
+    } finally {
+      setLoadingMoreTransactions(false);
+    }
+  };
+
   const handleSoftDeleteUser = async (userId: number) => {
     try {
       console.log('Deleting user:', userId);
@@ -953,6 +996,13 @@ const Admin = () => {
               </TableBody>
             </Table>
           )}
+          {!actionLoading && transactionFilter === 'all' && transactionsCursor && (
+            <div className="flex justify-center mt-4">
+              <Button variant="outline" onClick={loadMoreTransactions} disabled={loadingMoreTransactions}>
+                {loadingMoreTransactions ? 'Loading...' : 'Load more'}
+              </Button>
+            </div>
+          )}
         </CardContent>
       </Card>
     );
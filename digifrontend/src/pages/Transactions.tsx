@@ -16,11 +16,14 @@ interface Transaction {
 
 interface TransactionsResponse {
   transactions: Transaction[];
+  next_cursor: string | null;
 }
 
 const Transactions = () => {
   const [transactions, setTransactions] = useState<Transaction[]>([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [filteredTransactions, setFilteredTransactions] = useState<Transaction[]>([]);
   const [typeFilter, setTypeFilter] = useState('all');
   const [statusFilter, setStatusFilter] = useState('all');
@@ -34,13 +37,16 @@ const Transactions = () => {
     filterTransactions();
   }, [transactions, typeFilter, statusFilter]);
 
-  const fetchTransactions = async () => {
+  const fetchTransactions = async (cursor: string | null = null) => {
     try {
-      const response = await apiCall<TransactionsResponse>('/wallet/transactions');
+      const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+      const response = await apiCall<TransactionsResponse>(`/wallet/transactions${query}`);
       console.log('Transactions API response:', response);
       
       if (response.data && response.data.transactions) {
-        setTransactions(response.data.transactions);
+        const page = response.data.transactions;
+        setTransactions(previous => cursor ? [...previous, ...page] : page);
+        setNextCursor(response.data.next_cursor);
       } else if (response.error) {
         toast({
           title: "Error",
@@ -60,6 +66,12 @@ const Transactions = () => {
     }
   };
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    await fetchTransactions(nextCursor);
+    setLoadingMore(false);
+  };
+
   const filterTransactions = () => {
     let filtered = transactions;
 
@@ -275,6 +287,18 @@ const Transactions = () => {
               </table>
             </div>
           )}
+
+          {nextCursor && (
+            <div className="flex justify-center mt-6">
+              <button
+                onClick={loadMore}
+                disabled={loadingMore}
+                className="vault-button"
+              >
+                {loadingMore ? 'Loading...' : 'Load more'}
+              </button>
+            </div>
+          )}
         </div>
       </div>
     </div>
@@ -0,0 +1,35 @@
+import argparse
+import sys
+import time
+from datetime import datetime
+from app import create_cli_app
+from services.transaction_export import export_to_file, count_rows, FORMATS
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Export the transaction table to CSV or Parquet')
+    parser.add_argument('output', help='Output file path')
+    parser.add_argument('--format', choices=FORMATS, default='csv')
+    parser.add_argument('--start', type=datetime.fromisoformat, help='Only transactions created at or after this ISO date')
+    parser.add_argument('--end', type=datetime.fromisoformat, help='Only transactions created before this ISO date')
+    parser.add_argument('--wallet-id', type=int, help='Only transactions sent or received by this wallet')
+    parser.add_argument('--chunk-size', type=int, help='Rows fetched and written per chunk')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    app = create_cli_app()
+    with app.app_context():
+        total = count_rows(args.start, args.end, args.wallet_id)
+        started = time.perf_counter()
+        
+        def progress(written):
+            pct = (written / total * 100) if total else 100
+            sys.stdout.write(f"\rExported {written:,}/{total:,} rows ({pct:.1f}%)")
+            sys.stdout.flush()
+        
+        written = export_to_file(args.output, args.format, args.start, args.end, args.wallet_id,
+                                 chunk_size=args.chunk_size, progress=progress)
+        print(f"\nWrote {written:,} transactions to {args.output} in {time.perf_counter() - started:.1f}s")
+
+if __name__ == '__main__':
+    main()
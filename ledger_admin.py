@@ -0,0 +1,30 @@
+import sys
+from app import create_cli_app
+from models import db
+from services import ledger
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else 'check'
+    app = create_cli_app()
+    with app.app_context():
+        db.create_all()
+        if command == 'open':
+            print(f"Posted opening balances for {ledger.open_ledger()} wallets")
+        elif command == 'snapshot':
+            lag = int(sys.argv[2]) if len(sys.argv) > 2 else None
+            print(f"Snapshotted {ledger.snapshot_balances(lag_seconds=lag)} wallets")
+        elif command == 'audit' and len(sys.argv) > 2:
+            for key, value in ledger.audit_wallet(int(sys.argv[2])).items():
+                print(f"{key}: {value}")
+        elif command == 'check':
+            unbalanced = ledger.unbalanced_postings()
+            for transaction_id, total in unbalanced:
+                print(f"transaction {transaction_id}: legs sum to {total}")
+            print(f"{len(unbalanced)} unbalanced postings")
+            sys.exit(1 if unbalanced else 0)
+        else:
+            print("Usage: python ledger_admin.py [open|snapshot [lag_seconds]|audit <wallet_id>|check]")
+            sys.exit(2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from models import init_models, db
+from models.transaction import Transaction
+from config import Config
+
+def upgrade_db():
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    init_models(app)
+    
+    with app.app_context():
+        # Build the indexes declared on the Transaction model; existing ones are skipped
+        for index in sorted(Transaction.__table__.indexes, key=lambda i: i.name):
+            print(f"Creating index {index.name}...")
+            index.create(db.engine, checkfirst=True)
+        
+        # Refresh planner statistics so the new indexes get picked up
+        with db.engine.connect() as conn:
+            conn.execute(db.text('ANALYZE'))
+            conn.commit()
+            
+        print("Database migration completed successfully!")
+
+def downgrade_db():
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    init_models(app)
+    
+    with app.app_context():
+        for index in Transaction.__table__.indexes:
+            print(f"Dropping index {index.name}...")
+            index.drop(db.engine, checkfirst=True)
+        
+        print("Database downgrade completed successfully!")
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'downgrade':
+        downgrade_db()
+    else:
+        upgrade_db()
@@ -0,0 +1,111 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import MetaData, Table, inspect
+from sqlalchemy.types import BigInteger, Float, Integer
+from models import init_models, db
+from config import Config
+
+# (table, column) pairs stored as models.money.Money
+MONEY_COLUMNS = [
+    ('wallet', 'balance'),
+    ('transaction', 'amount'),
+    ('transaction_rollup', 'total_volume'),
+    ('wallet_daily_volume', 'volume'),
+    ('ledger_entry', 'amount'),
+    ('balance_snapshot', 'balance'),
+]
+
+def create_migration_app():
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    init_models(app)
+    return app
+
+def column_types(conn):
+    inspector = inspect(conn)
+    types = {}
+    for table in inspector.get_table_names():
+        for column in inspector.get_columns(table):
+            types[(table, column['name'])] = column['type']
+    return types
+
+def convert_column(conn, table, column, to_cents):
+    q = conn.dialect.identifier_preparer.quote
+    t, c = q(table), q(column)
+    if to_cents:
+        new_type, expression = 'BIGINT', f'CAST(ROUND({c} * 100) AS BIGINT)'
+    else:
+        new_type, expression = 'DOUBLE PRECISION' if conn.dialect.name == 'postgresql' else 'FLOAT', f'{c} / 100.0'
+    
+    if conn.dialect.name == 'postgresql':
+        conn.execute(db.text(f'ALTER TABLE {t} ALTER COLUMN {c} TYPE {new_type} USING {expression}'))
+    elif conn.dialect.name == 'sqlite':
+        rebuild_sqlite_table(conn, table, column, BigInteger() if to_cents else Float(), expression)
+    else:
+        # MySQL: MODIFY keeps the column in place but needs its NOT NULL and DEFAULT restated
+        existing = next(col for col in inspect(conn).get_columns(table) if col['name'] == column)
+        definition = new_type + ('' if existing['nullable'] else ' NOT NULL')
+        if existing.get('default') is not None:
+            definition += f" DEFAULT {existing['default']}"
+        if to_cents:
+            conn.execute(db.text(f'UPDATE {t} SET {c} = ROUND({c} * 100)'))
+            conn.execute(db.text(f'ALTER TABLE {t} MODIFY {c} {definition}'))
+        else:
+            conn.execute(db.text(f'ALTER TABLE {t} MODIFY {c} {definition}'))
+            conn.execute(db.text(f'UPDATE {t} SET {c} = {expression}'))
+
+def rebuild_sqlite_table(conn, table, column, new_type, expression):
+    """
+    SQLite cannot change a column's type, so rebuild the table the way its docs
+    describe: create a copy with the new type (constraints, defaults and column
+    order reflected from the old table), copy the rows, drop the old table,
+    rename the copy and recreate the indexes.
+    """
+    old = Table(table, MetaData(), autoload_with=conn)
+    new = old.to_metadata(old.metadata, name=f'{table}_new')
+    for index in list(new.indexes):
+        new.indexes.discard(index)
+    new.c[column].type = new_type
+    new.create(conn)
+    
+    q = conn.dialect.identifier_preparer.quote
+    columns = [q(col.name) for col in old.columns]
+    values = [expression if col.name == column else q(col.name) for col in old.columns]
+    conn.execute(db.text(
+        f'INSERT INTO {q(new.name)} ({", ".join(columns)}) SELECT {", ".join(values)} FROM {q(table)}'
+    ))
+    old.drop(conn)
+    conn.execute(db.text(f'ALTER TABLE {q(new.name)} RENAME TO {q(table)}'))
+    for index in old.indexes:
+        index.create(conn)
+
+def migrate(to_cents):
+    app = create_migration_app()
+    with app.app_context():
+        with db.engine.begin() as conn:
+            types = column_types(conn)
+            for table, column in MONEY_COLUMNS:
+                if (table, column) not in types:
+                    continue  # Table not created yet; create_all will use the new type
+                is_integer = isinstance(types[(table, column)], Integer)
+                if is_integer == to_cents:
+                    print(f"{table}.{column} already converted, skipping")
+                    continue
+                print(f"Converting {table}.{column} to {'integer cents' if to_cents else 'float'}...")
+                convert_column(conn, table, column, to_cents)
+        print("Database migration completed successfully!")
+
+def upgrade_db():
+    migrate(to_cents=True)
+
+def downgrade_db():
+    migrate(to_cents=False)
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'downgrade':
+        downgrade_db()
+    else:
+        upgrade_db()
@@ -0,0 +1,40 @@
+from datetime import datetime
+from . import db
+
+class ExportJob(db.Model):
+    """
+    Background transaction export, stored so any web worker can report its
+    progress and serve the file; see services/transaction_export.py.
+    """
+    __tablename__ = 'export_job'
+    
+    id = db.Column(db.String(32), primary_key=True)
+    format = db.Column(db.String(10), nullable=False)
+    path = db.Column(db.String(1024), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, completed, failed
+    start_at = db.Column(db.DateTime)
+    end_at = db.Column(db.DateTime)
+    wallet_id = db.Column(db.Integer)
+    total_rows = db.Column(db.Integer)
+    rows_written = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'format': self.format,
+            'status': self.status,
+            'rows_written': self.rows_written,
+            'total_rows': self.total_rows,
+            'progress': (self.rows_written / self.total_rows) if self.total_rows else None,
+            'error': self.error,
+            'filters': {
+                'start': self.start_at.isoformat() if self.start_at else None,
+                'end': self.end_at.isoformat() if self.end_at else None,
+                'wallet_id': self.wallet_id
+            },
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -0,0 +1,20 @@
+from datetime import datetime
+from . import db
+
+class IdempotencyKey(db.Model):
+    """
+    Response stored for a client's Idempotency-Key. A row without a
+    response_status is a claim held by the request currently running,
+    identified by its token; see services/idempotency.py.
+    """
+    __tablename__ = 'idempotency_key'
+    
+    user_id = db.Column(db.String(64), primary_key=True)
+    key = db.Column(db.String(255), primary_key=True)
+    request_hash = db.Column(db.String(64), nullable=False)
+    token = db.Column(db.String(32), nullable=False)
+    response_status = db.Column(db.Integer)
+    response_body = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    locked_until = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
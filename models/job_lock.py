@@ -0,0 +1,11 @@
+from datetime import datetime
+from . import db
+
+class JobLock(db.Model):
+    """Lease held by the instance currently allowed to run a scheduled job"""
+    __tablename__ = 'job_lock'
+    
+    name = db.Column(db.String(100), primary_key=True)
+    owner = db.Column(db.String(255), nullable=False)
+    locked_until = db.Column(db.DateTime, nullable=False)
+    acquired_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,34 @@
+from datetime import datetime
+from . import db
+from .money import Money
+
+class LedgerEntry(db.Model):
+    """
+    One immutable leg of a double-entry posting. Credits are positive, debits
+    negative, and the legs of a posting sum to zero. wallet_id is NULL for the
+    external account that funds deposits and receives withdrawals. folded is
+    set once the entry has been added to its wallet's BalanceSnapshot.
+    """
+    __tablename__ = 'ledger_entry'
+    __table_args__ = (
+        # Balance reads sum a wallet's entries not yet folded into its snapshot
+        db.Index('ix_ledger_entry_wallet_id', 'wallet_id', 'folded'),
+        db.Index('ix_ledger_entry_transaction', 'transaction_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transaction.id'), nullable=True)  # NULL for opening balances
+    wallet_id = db.Column(db.Integer, db.ForeignKey('wallet.id'), nullable=True)
+    entry_type = db.Column(db.String(10), nullable=False)  # debit, credit
+    amount = db.Column(Money, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    folded = db.Column(db.Boolean, default=False, nullable=False)
+
+class BalanceSnapshot(db.Model):
+    """A wallet's balance including every folded ledger entry; last_entry_id is the highest one folded"""
+    __tablename__ = 'balance_snapshot'
+    
+    wallet_id = db.Column(db.Integer, db.ForeignKey('wallet.id'), primary_key=True)
+    balance = db.Column(Money, nullable=False, default=0)
+    last_entry_id = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,49 @@
+"""
+Integer minor-unit money.
+
+Amounts are stored as BIGINT cents, so sums and comparisons in SQL are exact
+integer arithmetic. Python code keeps working in major units: values are
+rounded half-up to the cent on the way in and come back as floats. Code that
+needs exact arithmetic outside SQL (merging partial sums, vectorized scoring)
+works on integer cents via to_cents/from_cents or reads the raw column with
+cents().
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from sqlalchemy import BigInteger, type_coerce
+from sqlalchemy.types import TypeDecorator
+
+CENTS_PER_UNIT = 100
+
+def to_cents(value):
+    """Major units (int, float, Decimal or numeric string) to integer cents, rounding half up"""
+    if isinstance(value, int):
+        return value * CENTS_PER_UNIT
+    return int((Decimal(str(value)) * CENTS_PER_UNIT).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def from_cents(cents):
+    if isinstance(cents, int):
+        return cents / CENTS_PER_UNIT
+    return float(cents) / CENTS_PER_UNIT
+
+def round_money(value):
+    """Round a major-unit amount to what will actually be stored"""
+    return from_cents(to_cents(value))
+
+def money_sum(values):
+    """Exact sum of major-unit amounts that are already whole cents"""
+    return from_cents(sum(to_cents(value) for value in values))
+
+def cents(expression):
+    """Read a Money column or aggregate as raw integer cents"""
+    return type_coerce(expression, BigInteger)
+
+class Money(TypeDecorator):
+    """BIGINT cents in the database, major units in Python"""
+    impl = BigInteger
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        return None if value is None else to_cents(value)
+    
+    def process_result_value(self, value, dialect):
+        return None if value is None else from_cents(value)
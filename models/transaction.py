@@ -1,13 +1,25 @@
 from datetime import datetime
 from . import db
+from .money import Money
 
 class Transaction(db.Model):
     __tablename__ = 'transaction'
+    __table_args__ = (
+        # Fraud checks and history lookups filter on a wallet plus a time window
+        db.Index('ix_transaction_wallet_created', 'wallet_id', 'created_at'),
+        db.Index('ix_transaction_receiver_created', 'receiver_wallet_id', 'created_at'),
+        # Daily scans and reports filter on a time window only
+        db.Index('ix_transaction_created_at', 'created_at'),
+        # Only a small fraction of rows are ever flagged
+        db.Index('ix_transaction_suspicious', 'created_at',
+                 sqlite_where=db.text('is_suspicious = 1'),
+                 postgresql_where=db.text('is_suspicious')),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     wallet_id = db.Column(db.Integer, db.ForeignKey('wallet.id'), nullable=False)
     receiver_wallet_id = db.Column(db.Integer, db.ForeignKey('wallet.id'), nullable=True)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(Money, nullable=False)
     currency = db.Column(db.String(3), default='USD')
     transaction_type = db.Column(db.String(20), nullable=False)  # deposit, withdrawal, transfer
     status = db.Column(db.String(20), default='completed')  # completed, pending, failed
@@ -0,0 +1,22 @@
+from datetime import datetime
+from . import db
+from .money import Money
+
+class TransactionRollup(db.Model):
+    """Pre-aggregated transaction stats for one hour, maintained by tasks/rollups.py"""
+    __tablename__ = 'transaction_rollup'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    bucket_start = db.Column(db.DateTime, nullable=False, unique=True)  # Start of the hour (UTC)
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
+    total_volume = db.Column(Money, nullable=False, default=0)
+    suspicious_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'bucket_start': self.bucket_start.isoformat(),
+            'transaction_count': self.transaction_count,
+            'total_volume': self.total_volume,
+            'suspicious_count': self.suspicious_count
+        }
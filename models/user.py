@@ -1,5 +1,6 @@
 from datetime import datetime
-from . import db, bcrypt
+from . import db
+from services import password_hasher
 
 class User(db.Model):
     __tablename__ = 'user'
@@ -28,10 +29,13 @@ class User(db.Model):
             self.set_password(password)
     
     def set_password(self, password):
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password_hash = password_hasher.hash_password(password)
     
     def check_password(self, password):
-        return bcrypt.check_password_hash(self.password_hash, password)
+        return password_hasher.check_password(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self.password_hash)
     
     def soft_delete(self):
         self.is_deleted = True
@@ -1,12 +1,13 @@
 from datetime import datetime
 from . import db
+from .money import Money
 
 class Wallet(db.Model):
     __tablename__ = 'wallet'
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    balance = db.Column(db.Float, default=0.0)
+    balance = db.Column(Money, default=0)
     currency = db.Column(db.String(3), default='USD')
     is_active = db.Column(db.Boolean, default=True)
     is_deleted = db.Column(db.Boolean, default=False)  # Soft delete flag
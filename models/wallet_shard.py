@@ -0,0 +1,15 @@
+from datetime import datetime
+from . import db
+from .money import Money
+
+class WalletShard(db.Model):
+    """
+    One sub-balance of a sharded (hot) wallet. The wallet's balance is
+    wallet.balance plus the sum of its shards; see services/wallet_shards.py.
+    """
+    __tablename__ = 'wallet_shard'
+    
+    wallet_id = db.Column(db.Integer, db.ForeignKey('wallet.id'), primary_key=True)
+    shard = db.Column(db.Integer, primary_key=True)
+    balance = db.Column(Money, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
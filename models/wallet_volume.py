@@ -0,0 +1,16 @@
+from . import db
+from .money import Money
+
+class WalletDailyVolume(db.Model):
+    """Sent plus received transaction volume per wallet per UTC day, maintained by services/volume_index.py"""
+    __tablename__ = 'wallet_daily_volume'
+    __table_args__ = (
+        db.UniqueConstraint('wallet_id', 'day', name='uq_wallet_daily_volume_wallet_day'),
+        db.Index('ix_wallet_daily_volume_day', 'day'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    wallet_id = db.Column(db.Integer, db.ForeignKey('wallet.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    volume = db.Column(Money, nullable=False, default=0)
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
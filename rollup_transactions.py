@@ -0,0 +1,30 @@
+import sys
+from app import create_cli_app
+from models import db
+from tasks.rollups import backfill_rollups, compact_rollups, reconcile_rollups
+from services import volume_index
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else 'compact'
+    app = create_cli_app()
+    with app.app_context():
+        # Make sure the rollup and volume index tables exist before backfilling
+        db.create_all()
+        if command == 'backfill':
+            print(f"Backfilled {backfill_rollups()} hourly buckets")
+        elif command == 'compact':
+            print(f"Rolled up {compact_rollups()} hourly buckets")
+        elif command == 'backfill-volume':
+            print(f"Backfilled {volume_index.backfill()} wallet daily volume rows")
+        elif command == 'reconcile':
+            mismatches = reconcile_rollups()
+            for m in mismatches:
+                print(f"{m['bucket_start']}: rollup={m['rollup']} raw={m['raw']}")
+            print(f"{len(mismatches)} mismatched buckets")
+            sys.exit(1 if mismatches else 0)
+        else:
+            print("Usage: python rollup_transactions.py [backfill|backfill-volume|compact|reconcile]")
+            sys.exit(2)
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context, send_file, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models.user import User
 from models.wallet import Wallet
@@ -6,15 +6,23 @@ from models.transaction import Transaction
 from models import db
 from sqlalchemy import func
 from datetime import datetime, timedelta
+import csv
+import io
+import json
 from tasks.scheduled_tasks import scan_for_fraud, generate_daily_report
+from services import fraud_window
+from tasks.rollups import get_transaction_stats
+from services import mail_queue, pool_metrics, volume_index, wallet_shards
+from services.identity_cache import get_identity
+from services.balance_service import balance_column, get_balance
+from services import transaction_export
 
 admin_bp = Blueprint('admin', __name__)
 
 def admin_required(fn):
     def wrapper(*args, **kwargs):
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        if not user or not user.is_admin:
+        identity = get_identity(get_jwt_identity())
+        if not identity or not identity.is_admin:
             return jsonify({'error': 'Admin access required'}), 403
         return fn(*args, **kwargs)
     wrapper.__name__ = fn.__name__
@@ -35,23 +43,79 @@ def get_suspicious_transactions():
 @jwt_required()
 @admin_required
 def get_user_balances():
-    wallets = Wallet.query.join(User).filter(User.is_active == True).all()
-    total_balance = sum(w.balance for w in wallets)
-    
-    user_balances = [{
-        'user_id': w.user_id,
-        'email': w.user.email,
-        'first_name': w.user.first_name,
-        'last_name': w.user.last_name,
-        'balance': w.balance,
-        'currency': w.currency
-    } for w in wallets]
+    # Project only the columns we need so no per-wallet User lazy load happens
+    query = db.session.query(
+        Wallet.id.label('wallet_id'),
+        Wallet.user_id,
+        User.email,
+        User.first_name,
+        User.last_name,
+        balance_column().label('balance'),
+        Wallet.currency
+    ).join(User, User.id == Wallet.user_id).filter(
+        User.is_active == True
+    ).order_by(Wallet.id)
+    
+    stream = request.args.get('stream')
+    if stream:
+        if stream not in ('ndjson', 'csv'):
+            return jsonify({'error': 'Invalid stream format'}), 400
+        mimetype = 'application/x-ndjson' if stream == 'ndjson' else 'text/csv'
+        return Response(stream_with_context(stream_balances(query, stream)), mimetype=mimetype)
+    
+    total_balance = db.session.query(func.sum(balance_column())).select_from(Wallet).join(
+        User, User.id == Wallet.user_id
+    ).filter(User.is_active == True).scalar() or 0
+    
+    limit = min(request.args.get('limit', default=100, type=int), 1000)
+    if limit <= 0:
+        return jsonify({'error': 'Invalid limit'}), 400
+    cursor = request.args.get('cursor', type=int)
+    if cursor is not None:
+        query = query.filter(Wallet.id > cursor)
+    
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
     
     return jsonify({
-        'total_system_balance': total_balance,
-        'user_balances': user_balances
+        'total_system_balance': float(total_balance),
+        'user_balances': [balance_row_to_dict(row) for row in rows],
+        'next_cursor': rows[-1].wallet_id if has_more else None,
+        'limit': limit
     }), 200
 
+def balance_row_to_dict(row):
+    return {
+        'user_id': row.user_id,
+        'email': row.email,
+        'first_name': row.first_name,
+        'last_name': row.last_name,
+        'balance': row.balance,
+        'currency': row.currency
+    }
+
+def stream_balances(query, fmt):
+    """Yield every active user's balance as NDJSON lines or CSV rows"""
+    rows = query.execution_options(yield_per=1000)
+    
+    if fmt == 'ndjson':
+        for row in rows:
+            yield json.dumps(balance_row_to_dict(row)) + '\n'
+        return
+    
+    columns = ['user_id', 'email', 'first_name', 'last_name', 'balance', 'currency']
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for i, row in enumerate(rows, 1):
+        writer.writerow([getattr(row, c) for c in columns])
+        if i % 1000 == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
 @admin_bp.route('/top-users/balance', methods=['GET'])
 @jwt_required()
 @admin_required
@@ -63,12 +127,12 @@ def get_top_users_by_balance():
         User.email,
         User.first_name,
         User.last_name,
-        Wallet.balance,
+        balance_column().label('balance'),
         Wallet.currency
     ).join(Wallet).filter(
         User.is_active == True
     ).order_by(
-        Wallet.balance.desc()
+        balance_column().desc()
     ).limit(limit).all()
     
     result = [{
@@ -88,9 +152,28 @@ def get_top_users_by_balance():
 def get_top_users_by_volume():
     limit = request.args.get('limit', default=10, type=int)
     days = request.args.get('days', default=30, type=int)
+    source = request.args.get('source', default='index')
+    
+    if source not in ('index', 'raw'):
+        return jsonify({'error': 'Invalid source'}), 400
     
+    # Fall back to the raw join until the volume index has been backfilled
+    if source == 'index' and volume_index.is_populated():
+        result = volume_index.top_users_by_volume(limit, days)
+    else:
+        source = 'raw'
+        result = top_users_by_volume_raw(limit, days)
+    
+    return jsonify({
+        'top_users_by_volume': result,
+        'days': days,
+        'source': source
+    }), 200
+
+def top_users_by_volume_raw(limit, days, now=None):
+    """Top users by volume computed directly from the transaction table"""
     # Calculate the date threshold
-    threshold_date = datetime.utcnow() - timedelta(days=days)
+    threshold_date = (now or datetime.utcnow()) - timedelta(days=days)
     
     # Get transaction volume per user
     volume_by_user = db.session.query(
@@ -117,17 +200,32 @@ def get_top_users_by_volume():
         func.sum(Transaction.amount).desc()
     ).limit(limit).all()
     
-    result = [{
+    return [{
         'user_id': user.id,
         'email': user.email,
         'first_name': user.first_name,
         'last_name': user.last_name,
         'total_volume': float(user.total_volume)
     } for user in volume_by_user]
+
+@admin_bp.route('/wallets/<int:wallet_id>/shards', methods=['PUT'])
+@jwt_required()
+@admin_required
+def set_wallet_shards(wallet_id):
+    if not current_app.config.get('WALLET_SHARDING_ENABLED'):
+        return jsonify({'error': 'Wallet sharding is disabled'}), 400
+    if not db.session.get(Wallet, wallet_id):
+        return jsonify({'error': 'Wallet not found'}), 404
     
+    shards = (request.get_json() or {}).get('shards')
+    if not isinstance(shards, int) or isinstance(shards, bool) or not 0 <= shards <= 64:
+        return jsonify({'error': 'shards must be an integer between 0 and 64'}), 400
+    
+    wallet_shards.set_shards(wallet_id, shards)
     return jsonify({
-        'top_users_by_volume': result,
-        'days': days
+        'wallet_id': wallet_id,
+        'shards': shards,
+        'balance': get_balance(wallet_id)
     }), 200
 
 @admin_bp.route('/users/<int:user_id>/soft-delete', methods=['DELETE'])
@@ -136,7 +234,7 @@ def get_top_users_by_volume():
 def soft_delete_user(user_id):
     user = User.query.get_or_404(user_id)
     wallet = Wallet.query.filter_by(user_id=user_id).first()
-    balance = wallet.balance if wallet else 0
+    balance = get_balance(wallet.id) if wallet else 0
     
     user.soft_delete()
     
@@ -194,6 +292,100 @@ def manual_fraud_scan():
             'details': str(e)
         }), 500
 
+@admin_bp.route('/fraud-window/consistency', methods=['GET'])
+@jwt_required()
+@admin_required
+def check_fraud_window_consistency():
+    if not fraud_window.is_ready():
+        return jsonify({'error': 'Fraud window counters are not enabled'}), 400
+    
+    wallet_id = request.args.get('wallet_id', type=int)
+    mismatches = fraud_window.check_consistency([wallet_id] if wallet_id else None)
+    return jsonify({
+        'consistent': not mismatches,
+        'mismatches': mismatches
+    }), 200
+
+@admin_bp.route('/mail-queue/metrics', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_mail_queue_metrics():
+    queue = mail_queue.get_queue()
+    if queue is None:
+        return jsonify({'enabled': False}), 200
+    return jsonify(dict(queue.get_metrics(), enabled=True)), 200
+
+def parse_export_filters(params):
+    """Read start/end (ISO dates) and wallet_id; raises ValueError or TypeError on bad input"""
+    start = params.get('start')
+    end = params.get('end')
+    wallet_id = params.get('wallet_id')
+    return (
+        datetime.fromisoformat(start) if start else None,
+        datetime.fromisoformat(end) if end else None,
+        int(wallet_id) if wallet_id not in (None, '') else None
+    )
+
+@admin_bp.route('/transactions/export', methods=['GET'])
+@jwt_required()
+@admin_required
+def export_transactions():
+    try:
+        start, end, wallet_id = parse_export_filters(request.args)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid export filters'}), 400
+    
+    query = transaction_export.export_query(start, end, wallet_id)
+    return Response(
+        stream_with_context(transaction_export.iter_csv(query)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': 'attachment; filename=transactions.csv'}
+    )
+
+@admin_bp.route('/exports', methods=['POST'])
+@jwt_required()
+@admin_required
+def start_export():
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    fmt = data.get('format', 'csv')
+    if not isinstance(fmt, str) or fmt not in transaction_export.FORMATS:
+        return jsonify({'error': 'Invalid export format'}), 400
+    try:
+        start, end, wallet_id = parse_export_filters(data)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid export filters'}), 400
+    
+    job = transaction_export.start_export_job(current_app._get_current_object(), fmt, start, end, wallet_id)
+    return jsonify(job.to_dict()), 202
+
+@admin_bp.route('/exports/<job_id>', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_export(job_id):
+    job = transaction_export.get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Export not found'}), 404
+    return jsonify(job.to_dict()), 200
+
+@admin_bp.route('/exports/<job_id>/download', methods=['GET'])
+@jwt_required()
+@admin_required
+def download_export(job_id):
+    job = transaction_export.get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Export not found'}), 404
+    if job.status != 'completed':
+        return jsonify({'error': 'Export is not ready', 'status': job.status}), 409
+    return send_file(job.path, as_attachment=True, download_name=f'transactions.{job.format}')
+
+@admin_bp.route('/db-pool/metrics', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_db_pool_metrics():
+    return jsonify(pool_metrics.get_metrics(db.engine)), 200
+
 @admin_bp.route('/stats', methods=['GET'])
 @jwt_required()
 @admin_required
@@ -205,22 +397,17 @@ def get_system_stats():
         User.created_at >= (datetime.utcnow() - timedelta(hours=24))
     ).count()
     
-    # Get transaction stats
-    total_transactions = Transaction.query.count()
-    total_volume = db.session.query(func.sum(Transaction.amount)).scalar() or 0
-    
-    # Get suspicious transaction stats
-    suspicious_transactions = Transaction.query.filter_by(is_suspicious=True).count()
-    
-    # Get average transaction amount
-    avg_transaction = db.session.query(
-        func.avg(Transaction.amount)
-    ).scalar() or 0
+    # Get transaction stats from hourly rollups plus the un-rolled tail
+    transaction_stats = get_transaction_stats()
+    total_transactions = transaction_stats['transaction_count']
+    total_volume = transaction_stats['total_volume']
+    suspicious_transactions = transaction_stats['suspicious_count']
+    avg_transaction = total_volume / total_transactions if total_transactions else 0
     
     # Get total system balance
     total_balance = db.session.query(
-        func.sum(Wallet.balance)
-    ).scalar() or 0
+        func.sum(balance_column())
+    ).select_from(Wallet).scalar() or 0
     
     return jsonify({
         'user_stats': {
@@ -3,6 +3,7 @@ from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identi
 from models.user import User
 from models.wallet import Wallet
 from models import db
+from services.identity_cache import get_identity, identity_to_dict
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -51,6 +52,11 @@ def login():
     if not user.is_active:
         return jsonify({'error': 'Account is deactivated'}), 401
     
+    # Upgrade hashes made with an older work factor while we have the plaintext
+    if user.password_needs_rehash():
+        user.set_password(data['password'])
+        db.session.commit()
+    
     access_token = create_access_token(identity=str(user.id))
     return jsonify({
         'access_token': access_token,
@@ -60,13 +66,12 @@ def login():
 @auth_bp.route('/profile', methods=['GET'])
 @jwt_required()
 def get_profile():
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
+    identity = get_identity(get_jwt_identity())
     
-    if not user:
+    if not identity:
         return jsonify({'error': 'User not found'}), 404
     
-    return jsonify(user.to_dict()), 200
+    return jsonify(identity_to_dict(identity)), 200
 
 @auth_bp.route('/profile', methods=['PUT'])
 @jwt_required()
@@ -1,22 +1,37 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timedelta
+import base64
+import json
+import math
 from models.user import User
 from models import db
 from models.transaction import Transaction
 from models.wallet import Wallet
+from models.money import from_cents, money_sum, round_money, to_cents
 from services.email_service import send_transaction_alert
+from services import fraud_window, group_commit, ledger, metrics, volume_index, wallet_shards
+from services.identity_cache import get_identity
+from services.idempotency import current_claim, idempotent, save_response
+from services.balance_service import (
+    credit, credit_many, debit, get_balance as current_balance, lock_for_transfer, transfer as transfer_funds,
+    run_with_retry, InsufficientFundsError
+)
 from tasks.fraud_detection import check_transaction_for_fraud
-from sqlalchemy import func
+from sqlalchemy import func, insert
 
 wallet_bp = Blueprint('wallet', __name__)
 
-def check_fraud(wallet_id, amount, transaction_type):
-    """Basic fraud detection logic"""
-    now = datetime.utcnow()
+def get_fraud_window(wallet_id, now=None):
+    """Return (transactions in the last hour, amount in the last day) for a wallet"""
+    now = now or datetime.utcnow()
     hour_ago = now - timedelta(hours=1)
     day_ago = now - timedelta(days=1)
     
+    if current_app.config.get('FRAUD_WINDOW_ENABLED') and fraud_window.is_ready():
+        # Answer both windows from the incremental per-minute counters
+        return fraud_window.get_stats(wallet_id, now)
+    
     # Check for multiple transfers in short period
     recent_transfers = Transaction.query.filter(
         Transaction.wallet_id == wallet_id,
@@ -29,6 +44,10 @@ def check_fraud(wallet_id, amount, transaction_type):
         Transaction.created_at >= day_ago
     ).scalar() or 0
     
+    return recent_transfers, daily_total
+
+def score_fraud(recent_transfers, daily_total, amount):
+    """Apply the fraud rules to a wallet's recent activity and a new amount"""
     is_suspicious = False
     fraud_score = 0.0
     notes = []
@@ -50,6 +69,36 @@ def check_fraud(wallet_id, amount, transaction_type):
     
     return is_suspicious, fraud_score, " | ".join(notes) if notes else None
 
+@metrics.FRAUD_CHECK_SECONDS.time()
+def check_fraud(wallet_id, amount, transaction_type):
+    """Basic fraud detection logic"""
+    recent_transfers, daily_total = get_fraud_window(wallet_id)
+    return score_fraud(recent_transfers, daily_total, amount)
+
+def parse_amount(value):
+    """Validate a request amount; returns it rounded to the cent, or None if invalid"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        return None
+    amount = round_money(value)
+    return amount if amount > 0 else None
+
+def get_wallet_balance(wallet_id):
+    return current_balance(wallet_id)
+
+def completed_response(claim, message, wallet_id, transaction):
+    """
+    Response body for a money movement, built and saved against the request's
+    Idempotency-Key inside the unit of work so both commit together
+    """
+    db.session.flush()
+    response = {
+        'message': message,
+        'new_balance': get_wallet_balance(wallet_id),
+        'transaction': transaction.to_dict()
+    }
+    save_response(claim, response)
+    return response
+
 @wallet_bp.route('/balance', methods=['GET'])
 @jwt_required()
 def get_balance():
@@ -59,105 +108,106 @@ def get_balance():
     if not wallet:
         return jsonify({'error': 'Wallet not found'}), 404
     
-    return jsonify(wallet.to_dict()), 200
+    data = wallet.to_dict()
+    if ledger.is_enabled() or wallet_shards.is_enabled():
+        data['balance'] = current_balance(wallet.id)
+    return jsonify(data), 200
 
 @wallet_bp.route('/deposit', methods=['POST'])
 @jwt_required()
+@idempotent
 def deposit():
-    current_user_id = get_jwt_identity()
-    wallet = Wallet.query.filter_by(user_id=current_user_id).first()
+    identity = get_identity(get_jwt_identity())
     
-    if not wallet:
+    if not identity or not identity.wallet_id:
         return jsonify({'error': 'Wallet not found'}), 404
     
     data = request.get_json()
-    amount = data.get('amount')
+    amount = parse_amount(data.get('amount'))
     
-    if not amount or amount <= 0:
+    if amount is None:
         return jsonify({'error': 'Invalid amount'}), 400
     
-    is_suspicious, fraud_score, notes = check_fraud(wallet.id, amount, 'deposit')
-    
-    transaction = Transaction(
-        wallet_id=wallet.id,
-        amount=amount,
-        transaction_type='deposit',
-        status='completed',
-        is_suspicious=is_suspicious,
-        fraud_score=fraud_score
-    )
-    
-    if is_suspicious:
-        user = User.query.get(current_user_id)
-        send_transaction_alert(user.email, 'deposit', amount, 'USD', fraud_score)
-    
-    wallet.balance += amount
-    db.session.add(transaction)
-    db.session.commit()
-    
-    return jsonify({
-        'message': 'Deposit successful',
-        'new_balance': wallet.balance,
-        'transaction': transaction.to_dict()
-    }), 200
+    wallet_id = identity.wallet_id
+    claim = current_claim()
+    
+    def apply_deposit():
+        is_suspicious, fraud_score, notes = check_fraud(wallet_id, amount, 'deposit')
+        transaction = Transaction(
+            wallet_id=wallet_id,
+            amount=amount,
+            transaction_type='deposit',
+            status='completed',
+            is_suspicious=is_suspicious,
+            fraud_score=fraud_score
+        )
+        credit(wallet_id, amount)
+        db.session.add(transaction)
+        return transaction, completed_response(claim, 'Deposit successful', wallet_id, transaction)
+    
+    transaction, response = group_commit.execute(apply_deposit)
+    
+    if transaction.is_suspicious:
+        send_transaction_alert(identity.email, 'deposit', amount, 'USD', transaction.fraud_score)
+    
+    return jsonify(response), 200
 
 @wallet_bp.route('/withdraw', methods=['POST'])
 @jwt_required()
+@idempotent
 def withdraw():
-    current_user_id = get_jwt_identity()
-    wallet = Wallet.query.filter_by(user_id=current_user_id).first()
+    identity = get_identity(get_jwt_identity())
     
-    if not wallet:
+    if not identity or not identity.wallet_id:
         return jsonify({'error': 'Wallet not found'}), 404
     
     data = request.get_json()
-    amount = data.get('amount')
+    amount = parse_amount(data.get('amount'))
     
-    if not amount or amount <= 0:
+    if amount is None:
         return jsonify({'error': 'Invalid amount'}), 400
     
-    if wallet.balance < amount:
+    wallet_id = identity.wallet_id
+    claim = current_claim()
+    
+    def apply_withdrawal():
+        is_suspicious, fraud_score, notes = check_fraud(wallet_id, amount, 'withdrawal')
+        transaction = Transaction(
+            wallet_id=wallet_id,
+            amount=amount,
+            transaction_type='withdrawal',
+            status='completed',
+            is_suspicious=is_suspicious,
+            fraud_score=fraud_score
+        )
+        debit(wallet_id, amount)
+        db.session.add(transaction)
+        return transaction, completed_response(claim, 'Withdrawal successful', wallet_id, transaction)
+    
+    try:
+        transaction, response = group_commit.execute(apply_withdrawal)
+    except InsufficientFundsError:
         return jsonify({'error': 'Insufficient funds'}), 400
     
-    is_suspicious, fraud_score, notes = check_fraud(wallet.id, amount, 'withdrawal')
-    
-    transaction = Transaction(
-        wallet_id=wallet.id,
-        amount=amount,
-        transaction_type='withdrawal',
-        status='completed',
-        is_suspicious=is_suspicious,
-        fraud_score=fraud_score
-    )
-    
-    if is_suspicious:
-        user = User.query.get(current_user_id)
-        send_transaction_alert(user.email, 'withdrawal', amount, 'USD', fraud_score)
+    if transaction.is_suspicious:
+        send_transaction_alert(identity.email, 'withdrawal', amount, 'USD', transaction.fraud_score)
     
-    wallet.balance -= amount
-    db.session.add(transaction)
-    db.session.commit()
-    
-    return jsonify({
-        'message': 'Withdrawal successful',
-        'new_balance': wallet.balance,
-        'transaction': transaction.to_dict()
-    }), 200
+    return jsonify(response), 200
 
 @wallet_bp.route('/transfer', methods=['POST'])
 @jwt_required()
+@idempotent
 def transfer():
-    current_user_id = get_jwt_identity()
-    sender_wallet = Wallet.query.filter_by(user_id=current_user_id).first()
+    identity = get_identity(get_jwt_identity())
     
-    if not sender_wallet:
+    if not identity or not identity.wallet_id:
         return jsonify({'error': 'Wallet not found'}), 404
     
     data = request.get_json()
     receiver_email = data.get('receiver_email')
-    amount = data.get('amount')
+    amount = parse_amount(data.get('amount'))
     
-    if not receiver_email or not amount or amount <= 0:
+    if not receiver_email or amount is None:
         return jsonify({'error': 'Invalid transfer details'}), 400
     
     receiver = User.query.filter_by(email=receiver_email).first()
@@ -168,51 +218,260 @@ def transfer():
     if not receiver_wallet:
         return jsonify({'error': 'Receiver wallet not found'}), 404
     
-    if sender_wallet.balance < amount:
+    sender_wallet_id = identity.wallet_id
+    receiver_wallet_id = receiver_wallet.id
+    claim = current_claim()
+    
+    def apply_transfer():
+        is_suspicious, fraud_score, notes = check_fraud(sender_wallet_id, amount, 'transfer')
+        transaction = Transaction(
+            wallet_id=sender_wallet_id,
+            receiver_wallet_id=receiver_wallet_id,
+            amount=amount,
+            transaction_type='transfer',
+            status='completed',
+            is_suspicious=is_suspicious,
+            fraud_score=fraud_score
+        )
+        transfer_funds(sender_wallet_id, receiver_wallet_id, amount)
+        db.session.add(transaction)
+        return transaction, completed_response(claim, 'Transfer successful', sender_wallet_id, transaction)
+    
+    try:
+        transaction, response = group_commit.execute(apply_transfer)
+    except InsufficientFundsError:
         return jsonify({'error': 'Insufficient funds'}), 400
     
-    is_suspicious, fraud_score, notes = check_fraud(sender_wallet.id, amount, 'transfer')
-    
-    transaction = Transaction(
-        wallet_id=sender_wallet.id,
-        receiver_wallet_id=receiver_wallet.id,
-        amount=amount,
-        transaction_type='transfer',
-        status='completed',
-        is_suspicious=is_suspicious,
-        fraud_score=fraud_score
-    )
+    if transaction.is_suspicious:
+        send_transaction_alert(identity.email, 'transfer', amount, 'USD', transaction.fraud_score)
     
-    if is_suspicious:
-        user = User.query.get(current_user_id)
-        send_transaction_alert(user.email, 'transfer', amount, 'USD', fraud_score)
-    
-    sender_wallet.balance -= amount
-    receiver_wallet.balance += amount
+    return jsonify(response), 200
+
+def resolve_wallets_by_email(emails, chunk_size=1000):
+    """Map receiver emails to wallet ids with one IN query per chunk"""
+    emails = list(emails)
+    wallets = {}
+    for start in range(0, len(emails), chunk_size):
+        rows = db.session.query(User.email, Wallet.id).join(
+            Wallet, Wallet.user_id == User.id
+        ).filter(User.email.in_(emails[start:start + chunk_size])).all()
+        wallets.update(rows)
+    return wallets
+
+@wallet_bp.route('/transfer/batch', methods=['POST'])
+@jwt_required()
+def batch_transfer():
+    identity = get_identity(get_jwt_identity())
     
-    db.session.add(transaction)
-    db.session.commit()
+    if not identity or not identity.wallet_id:
+        return jsonify({'error': 'Wallet not found'}), 404
     
+    data = request.get_json() or {}
+    items = data.get('transfers')
+    max_items = current_app.config.get('BATCH_TRANSFER_MAX_ITEMS', 10000)
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'Invalid transfer details'}), 400
+    if len(items) > max_items:
+        return jsonify({'error': f'Too many transfers (max {max_items})'}), 400
+    
+    chunk_size = data.get('chunk_size', current_app.config.get('BATCH_TRANSFER_CHUNK_SIZE', 500))
+    if not isinstance(chunk_size, int) or chunk_size <= 0:
+        return jsonify({'error': 'Invalid chunk size'}), 400
+    
+    sender_wallet_id = identity.wallet_id
+    results = [None] * len(items)
+    
+    # Validate items and resolve all receivers up front
+    valid = []
+    for index, item in enumerate(items):
+        receiver_email = item.get('receiver_email') if isinstance(item, dict) else None
+        amount = parse_amount(item.get('amount')) if isinstance(item, dict) else None
+        if not receiver_email or amount is None:
+            results[index] = {'index': index, 'status': 'failed', 'error': 'Invalid transfer details'}
+            continue
+        valid.append((index, receiver_email, amount))
+    
+    receiver_wallets = resolve_wallets_by_email({email for _, email, _ in valid})
+    pending = []
+    for index, receiver_email, amount in valid:
+        receiver_wallet_id = receiver_wallets.get(receiver_email)
+        if receiver_wallet_id is None:
+            results[index] = {'index': index, 'receiver_email': receiver_email, 'amount': amount,
+                              'status': 'failed', 'error': 'Receiver not found'}
+            continue
+        pending.append((index, receiver_email, receiver_wallet_id, amount))
+    
+    # Fraud rules see each accepted transfer as prior activity for the next one
+    recent_transfers, daily_total = get_fraud_window(sender_wallet_id)
+    suspicious_amounts = []
+    
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        
+        def apply_chunk():
+            lock_for_transfer(sender_wallet_id, [receiver_id for _, _, receiver_id, _ in chunk])
+            # Running balance in cents so a chunk can spend exactly down to zero
+            available = to_cents(get_wallet_balance(sender_wallet_id) or 0)
+            window_count, window_total = recent_transfers, daily_total
+            accepted, rows, credits, outcome = [], [], {}, {}
+            
+            for index, receiver_email, receiver_wallet_id, amount in chunk:
+                if to_cents(amount) > available:
+                    outcome[index] = {'index': index, 'receiver_email': receiver_email, 'amount': amount,
+                                      'status': 'failed', 'error': 'Insufficient funds'}
+                    continue
+                is_suspicious, fraud_score, notes = score_fraud(window_count, window_total, amount)
+                available -= to_cents(amount)
+                window_count += 1
+                window_total += amount
+                credits[receiver_wallet_id] = credits.get(receiver_wallet_id, 0) + to_cents(amount)
+                accepted.append((index, receiver_email, amount))
+                rows.append({
+                    'wallet_id': sender_wallet_id,
+                    'receiver_wallet_id': receiver_wallet_id,
+                    'amount': amount,
+                    'transaction_type': 'transfer',
+                    'status': 'completed',
+                    'is_suspicious': is_suspicious,
+                    'fraud_score': fraud_score,
+                    'created_at': datetime.utcnow()
+                })
+            
+            if rows:
+                debit(sender_wallet_id, money_sum(row['amount'] for row in rows))
+                credit_many({wallet_id: from_cents(total) for wallet_id, total in credits.items()})
+                transaction_ids = db.session.scalars(
+                    insert(Transaction).returning(Transaction.id, sort_by_parameter_order=True),
+                    rows
+                ).all()
+                # Core inserts bypass the ORM flush hooks
+                volume_index.record_transactions(db.session.connection(), [
+                    (row['wallet_id'], row['receiver_wallet_id'], row['amount'], row['created_at'])
+                    for row in rows
+                ])
+                if ledger.is_enabled():
+                    ledger.record_transactions(db.session.connection(), [
+                        (transaction_id, row['wallet_id'], row['receiver_wallet_id'], row['amount'],
+                         row['transaction_type'], row['created_at'])
+                        for row, transaction_id in zip(rows, transaction_ids)
+                    ])
+                for (index, receiver_email, amount), row, transaction_id in zip(accepted, rows, transaction_ids):
+                    outcome[index] = {'index': index, 'receiver_email': receiver_email, 'amount': amount,
+                                      'status': 'completed', 'transaction_id': transaction_id,
+                                      'is_suspicious': row['is_suspicious'], 'fraud_score': row['fraud_score']}
+            return outcome, rows, window_count, window_total
+        
+        try:
+            outcome, rows, recent_transfers, daily_total = run_with_retry(apply_chunk)
+        except InsufficientFundsError:
+            # The balance changed underneath the chunk; report it rather than partially applying
+            outcome, rows = {}, []
+            for index, receiver_email, _, amount in chunk:
+                outcome[index] = {'index': index, 'receiver_email': receiver_email, 'amount': amount,
+                                  'status': 'failed', 'error': 'Insufficient funds'}
+        
+        for index, result in outcome.items():
+            results[index] = result
+        for row in rows:
+            if fraud_window.is_ready():
+                fraud_window.record(row['wallet_id'], row['amount'], row['created_at'])
+            if row['is_suspicious']:
+                suspicious_amounts.append((row['amount'], row['fraud_score']))
+    
+    for amount, fraud_score in suspicious_amounts:
+        send_transaction_alert(identity.email, 'transfer', amount, 'USD', fraud_score)
+    
+    completed = sum(1 for r in results if r['status'] == 'completed')
     return jsonify({
-        'message': 'Transfer successful',
-        'new_balance': sender_wallet.balance,
-        'transaction': transaction.to_dict()
+        'message': f'{completed} of {len(results)} transfers completed',
+        'new_balance': get_wallet_balance(sender_wallet_id),
+        'results': results
     }), 200
 
+def encode_cursor(transaction):
+    """Encode the (created_at, id) keyset position of a transaction as an opaque cursor"""
+    raw = f"{transaction.created_at.isoformat()}|{transaction.id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    """Decode a cursor back into (created_at, id); raises ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        created_at, transaction_id = raw.split('|', 1)
+        return datetime.fromisoformat(created_at), int(transaction_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def wallet_transactions_query(wallet_id):
+    """Transactions sent or received by a wallet, newest first with id as tie-breaker"""
+    return Transaction.query.filter(
+        (Transaction.wallet_id == wallet_id) |
+        (Transaction.receiver_wallet_id == wallet_id)
+    ).order_by(Transaction.created_at.desc(), Transaction.id.desc())
+
+def stream_transactions(query, fmt):
+    """Yield transactions as NDJSON lines or as a chunked JSON document"""
+    batch_size = current_app.config.get('TRANSACTIONS_STREAM_BATCH_SIZE', 1000)
+    rows = query.yield_per(batch_size)
+    
+    if fmt == 'ndjson':
+        for t in rows:
+            yield json.dumps(t.to_dict()) + '\n'
+        return
+    
+    yield '{"transactions": ['
+    first = True
+    for t in rows:
+        if not first:
+            yield ','
+        first = False
+        yield json.dumps(t.to_dict())
+    yield ']}'
+
 @wallet_bp.route('/transactions', methods=['GET'])
 @jwt_required()
 def get_transactions():
-    current_user_id = get_jwt_identity()
-    wallet = Wallet.query.filter_by(user_id=current_user_id).first()
+    identity = get_identity(get_jwt_identity())
     
-    if not wallet:
+    if not identity or not identity.wallet_id:
         return jsonify({'error': 'Wallet not found'}), 404
     
-    transactions = Transaction.query.filter(
-        (Transaction.wallet_id == wallet.id) |
-        (Transaction.receiver_wallet_id == wallet.id)
-    ).order_by(Transaction.created_at.desc()).all()
+    query = wallet_transactions_query(identity.wallet_id)
+    
+    # Opt-in streaming of the full history with flat memory usage
+    stream = request.args.get('stream')
+    if stream:
+        if stream not in ('ndjson', 'json'):
+            return jsonify({'error': 'Invalid stream format'}), 400
+        mimetype = 'application/x-ndjson' if stream == 'ndjson' else 'application/json'
+        return Response(stream_with_context(stream_transactions(query, stream)), mimetype=mimetype)
+    
+    # Keyset pagination on (created_at, id)
+    default_limit = current_app.config.get('TRANSACTIONS_PAGE_SIZE', 50)
+    max_limit = current_app.config.get('TRANSACTIONS_MAX_PAGE_SIZE', 500)
+    limit = request.args.get('limit', default=default_limit, type=int)
+    if limit <= 0:
+        return jsonify({'error': 'Invalid limit'}), 400
+    limit = min(limit, max_limit)
+    
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.filter(
+            (Transaction.created_at < cursor_created_at) |
+            ((Transaction.created_at == cursor_created_at) & (Transaction.id < cursor_id))
+        )
+    
+    # Fetch one extra row to know whether another page exists
+    transactions = query.limit(limit + 1).all()
+    has_more = len(transactions) > limit
+    transactions = transactions[:limit]
     
     return jsonify({
-        'transactions': [t.to_dict() for t in transactions]
+        'transactions': [t.to_dict() for t in transactions],
+        'next_cursor': encode_cursor(transactions[-1]) if has_more else None,
+        'limit': limit
     }), 200
@@ -1,6 +1,6 @@
 from tasks.fraud_detection import daily_fraud_scan
-from app import create_app
+from app import create_cli_app
 
-app = create_app()
+app = create_cli_app()
 with app.app_context():
     daily_fraud_scan()
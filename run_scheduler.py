@@ -0,0 +1,33 @@
+"""
+Dedicated worker for scheduled jobs (midnight fraud scan, hourly rollups).
+
+Run one or more of these alongside web workers started with
+SCHEDULER_ENABLED=false; the DB leader lock makes sure each job runs once.
+Job metrics are served on SCHEDULER_METRICS_PORT, and the query profiler is
+enabled from the same QUERY_PROFILER_* settings as the web app.
+"""
+import logging
+from app import create_cli_app
+from models import db
+from services import mail_queue, metrics, query_profiler
+from tasks.scheduler import create_scheduler
+
+logger = logging.getLogger(__name__)
+
+def main():
+    app = create_cli_app()
+    # Alerts from the scan are delivered in the background like in the web app
+    mail_queue.init_app(app)
+    query_profiler.init_app(app)
+    metrics.start_http_server(app, app.config.get('SCHEDULER_METRICS_PORT', 9102))
+    with app.app_context():
+        db.create_all()
+    scheduler = create_scheduler(app, blocking=True)
+    logger.info("Scheduler worker started")
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        logger.info("Scheduler worker stopped")
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,7 @@
-from app import app
+from app import create_app
+
+# WSGI entry point, e.g. gunicorn run_server:app
+app = create_app()
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
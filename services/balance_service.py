@@ -0,0 +1,167 @@
+"""
+Atomic wallet balance updates.
+
+Balances are changed with conditional UPDATE statements evaluated by the database
+(`balance = balance - :amount WHERE balance >= :amount`) instead of read-modify-write
+in Python, so concurrent workers cannot lose updates or overdraw a wallet. Transfers
+lock both wallet rows in id order to avoid deadlocks, and whole units of work are
+retried on deadlocks and serialization failures.
+
+With LEDGER_ENABLED the balance lives in the ledger (services/ledger.py) instead:
+debits lock only the debited wallet and check its derived balance, and credits
+need no statement at all because the ledger postings are written with the
+transaction row.
+
+With WALLET_SHARDING_ENABLED, credits to hot wallets land on one of their
+sub-balance shards (services/wallet_shards.py) instead of the wallet row.
+"""
+import logging
+import random
+import time
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import update, bindparam
+from sqlalchemy.exc import DBAPIError
+from models import db
+from models.wallet import Wallet
+from services import ledger, wallet_shards
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_SQLSTATES = ('40001', '40P01')  # serialization_failure, deadlock_detected
+RETRYABLE_MESSAGES = ('deadlock', 'database is locked', 'lock wait timeout', 'could not serialize')
+
+class InsufficientFundsError(Exception):
+    pass
+
+def debit(wallet_id, amount):
+    """Subtract amount from a wallet, failing if the balance would go negative"""
+    if ledger.is_enabled():
+        lock_wallets([wallet_id])
+        if ledger.get_balance(wallet_id) < amount:
+            raise InsufficientFundsError(f'Insufficient funds in wallet {wallet_id}')
+        return
+    statement = (
+        update(Wallet)
+        .where(Wallet.id == wallet_id, Wallet.balance >= amount)
+        .values(balance=Wallet.balance - amount, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    result = db.session.execute(statement)
+    if result.rowcount != 1 and wallet_shards.shard_count(wallet_id):
+        # The main balance ran short: fold the shards in and try once more
+        lock_wallets([wallet_id])
+        if wallet_shards.sweep(wallet_id):
+            result = db.session.execute(statement)
+    if result.rowcount != 1:
+        raise InsufficientFundsError(f'Insufficient funds in wallet {wallet_id}')
+
+def credit(wallet_id, amount):
+    """Add amount to a wallet"""
+    if ledger.is_enabled():
+        return  # Posted by the ledger with the transaction row
+    if wallet_shards.credit_shard(wallet_id, amount):
+        return
+    db.session.execute(
+        update(Wallet)
+        .where(Wallet.id == wallet_id)
+        .values(balance=Wallet.balance + amount, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+def credit_many(amounts_by_wallet):
+    """Add amounts to many wallets with a single executemany UPDATE"""
+    if not amounts_by_wallet or ledger.is_enabled():
+        return
+    amounts_by_wallet = {
+        wallet_id: amount for wallet_id, amount in amounts_by_wallet.items()
+        if not wallet_shards.credit_shard(wallet_id, amount)
+    }
+    if not amounts_by_wallet:
+        return
+    wallet_table = Wallet.__table__
+    now = datetime.utcnow()
+    db.session.execute(
+        wallet_table.update()
+        .where(wallet_table.c.id == bindparam('target_id'))
+        .values(balance=wallet_table.c.balance + bindparam('delta'), updated_at=now),
+        [{'target_id': wallet_id, 'delta': amount} for wallet_id, amount in amounts_by_wallet.items()]
+    )
+
+def lock_wallets(wallet_ids):
+    """Take row locks on the given wallets in a consistent (id) order.
+    This is a no-op on databases without SELECT ... FOR UPDATE such as SQLite."""
+    db.session.query(Wallet.id).filter(
+        Wallet.id.in_(sorted(set(wallet_ids)))
+    ).order_by(Wallet.id).with_for_update().all()
+
+def lock_for_transfer(sender_wallet_id, receiver_wallet_ids):
+    """Lock the wallet rows a transfer will change; with the ledger only the sender's"""
+    if ledger.is_enabled():
+        lock_wallets([sender_wallet_id])
+    else:
+        # Sharded receivers are credited on a shard row, not the wallet row
+        lock_wallets([sender_wallet_id] + [
+            wallet_id for wallet_id in receiver_wallet_ids if not wallet_shards.shard_count(wallet_id)
+        ])
+
+def get_balance(wallet_id):
+    if ledger.is_enabled():
+        return ledger.get_balance(wallet_id)
+    if wallet_shards.is_enabled():
+        return wallet_shards.get_balance(wallet_id)
+    return db.session.query(Wallet.balance).filter(Wallet.id == wallet_id).scalar()
+
+def balance_column():
+    """
+    Per-wallet balance for admin queries: derived from the ledger when it is on
+    (wallet.balance is only refreshed by snapshots), including shards when
+    sharding is on
+    """
+    if ledger.is_enabled():
+        return ledger.balance_expression()
+    if wallet_shards.is_enabled():
+        return wallet_shards.total_balance_expression()
+    return Wallet.balance
+
+def transfer(sender_wallet_id, receiver_wallet_id, amount):
+    """Move amount between two wallets inside the current transaction"""
+    lock_for_transfer(sender_wallet_id, [receiver_wallet_id])
+    debit(sender_wallet_id, amount)
+    credit(receiver_wallet_id, amount)
+
+def is_retryable(error):
+    orig = getattr(error, 'orig', None)
+    code = getattr(orig, 'pgcode', None) or getattr(orig, 'sqlstate', None)
+    if code in RETRYABLE_SQLSTATES:
+        return True
+    message = str(orig or error).lower()
+    return any(m in message for m in RETRYABLE_MESSAGES)
+
+def run_with_retry(fn, retries=None, backoff=None):
+    """
+    Run fn() and commit, retrying the whole unit of work on deadlocks and
+    serialization failures. fn must be safe to re-run after a rollback.
+    """
+    if retries is None:
+        retries = current_app.config.get('BALANCE_UPDATE_RETRIES', 5)
+    if backoff is None:
+        backoff = current_app.config.get('BALANCE_UPDATE_RETRY_BACKOFF', 0.01)
+    
+    attempt = 0
+    while True:
+        try:
+            result = fn()
+            db.session.commit()
+            return result
+        except DBAPIError as e:
+            db.session.rollback()
+            if attempt >= retries or not is_retryable(e):
+                raise
+            delay = backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+            logger.warning(f"Retrying balance update after transient error (attempt {attempt + 1}): {e.orig}")
+            time.sleep(delay)
+            attempt += 1
+        except Exception:
+            db.session.rollback()
+            raise
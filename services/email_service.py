@@ -1,12 +1,13 @@
 import logging
 from datetime import datetime
+from services.mail_queue import send_or_enqueue
 
 logger = logging.getLogger(__name__)
 
 def send_transaction_alert(user_email, transaction_type, amount, currency, fraud_score=None):
     """
-    Mock email service to send transaction alerts.
-    In a production environment, this would use a real email service like SendGrid or AWS SES.
+    Send a transaction alert. The email is handed to the outbound mail queue when it
+    is running, so callers never wait on delivery; otherwise it is logged inline.
     """
     subject = f"Transaction Alert - {transaction_type}"
     message = (
@@ -20,30 +21,27 @@ def send_transaction_alert(user_email, transaction_type, amount, currency, fraud
     
     message += "\nIf you did not authorize this transaction, please contact support immediately.\n\nBest regards,\nDigital Wallet Team"
     
-    # Log the email for demonstration purposes
-    log_message = f"""
-
-MOCK EMAIL SENT
-{'='*50}
-To: {user_email}
-Subject: {subject}
-Message:
-{message}
-{'='*50}
-"""
-    logger.info(log_message)
+    send_or_enqueue(user_email, subject, message)
     return True
 
-def send_fraud_report(admin_email, suspicious_transactions):
+def send_fraud_report(admin_email, suspicious_transactions, summary=None):
     """
-    Mock email service to send daily fraud reports to administrators.
+    Send the daily fraud report to an administrator through the outbound mail queue.
+    summary, when given, is the scan summary from daily_fraud_scan.
     """
     subject = f"Daily Fraud Report - {datetime.utcnow().strftime('%Y-%m-%d')}"
     
+    message = ""
+    if summary:
+        message += (
+            f"Scanned {summary['scanned']} transactions ({summary['volume']:.2f} total volume) "
+            f"across {summary['shards']} shard(s) in {summary['seconds']}s; "
+            f"{summary['suspicious']} flagged as suspicious.\n\n"
+        )
     if not suspicious_transactions:
-        message = "No suspicious transactions were detected in the last 24 hours."
+        message += "No suspicious transactions were detected in the last 24 hours."
     else:
-        message = "The following suspicious transactions were detected in the last 24 hours:\n\n"
+        message += "The following suspicious transactions were detected in the last 24 hours:\n\n"
         for tx in suspicious_transactions:
             message += (
                 f"Transaction ID: {tx.id}\n"
@@ -54,14 +52,5 @@ def send_fraud_report(admin_email, suspicious_transactions):
                 f"{'='*30}\n"
             )
     
-    # Log the email for demonstration purposes
-    log_message = f"""
-MOCK ADMIN EMAIL SENT
-{'='*50}
-To: {admin_email}
-Subject: {subject}
-Message:
-{message}
-{'='*50}"""
-    logger.info(log_message)
+    send_or_enqueue(admin_email, subject, message)
     return True
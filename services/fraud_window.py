@@ -0,0 +1,225 @@
+"""
+Incremental sliding-window counters for the synchronous fraud check.
+
+Each wallet keeps a ring of per-minute buckets (transaction count and amount sum)
+covering the last 24 hours, plus running totals for the last hour's count and the
+last day's sum, so `check_fraud` can answer without querying the transaction table.
+
+The default backend keeps state in-process, which is only exact when a single
+process handles all writes; multi-worker deployments should plug in a shared
+backend implementing `WindowBackend`.
+"""
+import logging
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from models.money import from_cents, to_cents
+
+logger = logging.getLogger(__name__)
+
+DAY_MINUTES = 24 * 60
+HOUR_MINUTES = 60
+
+def minute_index(dt):
+    """Whole minutes since the epoch for a naive UTC datetime"""
+    return int((dt - datetime(1970, 1, 1)).total_seconds() // 60)
+
+class WalletWindow:
+    """Ring of per-minute buckets for one wallet"""
+    
+    def __init__(self, size=DAY_MINUTES):
+        self.size = size
+        self.counts = [0] * size
+        self.sums = [0] * size
+        self.head = None  # Latest minute the ring has been advanced to
+        self.hour_count = 0
+        self.day_sum = 0
+    
+    def advance(self, minute):
+        """Expire buckets that fell out of the windows ending at `minute`"""
+        if self.head is None or minute - self.head >= self.size:
+            self.counts = [0] * self.size
+            self.sums = [0] * self.size
+            self.hour_count = 0
+            self.day_sum = 0
+            self.head = minute
+            return
+        
+        for m in range(self.head + 1, minute + 1):
+            # Minute m - 60 leaves the hourly window
+            self.hour_count -= self.counts[(m - HOUR_MINUTES) % self.size]
+            # Minute m - size leaves the daily window and its bucket is reused for m
+            i = m % self.size
+            self.day_sum -= self.sums[i]
+            self.counts[i] = 0
+            self.sums[i] = 0
+        self.head = max(self.head, minute)
+    
+    def add(self, minute, amount):
+        self.advance(minute)
+        age = self.head - minute
+        if age >= self.size:
+            return  # Older than the daily window
+        i = minute % self.size
+        self.counts[i] += 1
+        self.sums[i] += amount
+        self.day_sum += amount
+        if age < HOUR_MINUTES:
+            self.hour_count += 1
+    
+    def stats(self, minute):
+        self.advance(minute)
+        return self.hour_count, self.day_sum
+
+class WindowBackend:
+    """Storage interface for per-wallet window state"""
+    
+    def record(self, wallet_id, amount, created_at):
+        raise NotImplementedError
+    
+    def get_stats(self, wallet_id, now):
+        """Return (transactions in the last hour, amount in the last day)"""
+        raise NotImplementedError
+    
+    def clear(self):
+        raise NotImplementedError
+
+class InMemoryWindowBackend(WindowBackend):
+    """Process-local backend; exact only when one process handles all writes"""
+    
+    def __init__(self):
+        self.windows = {}
+        self.lock = threading.Lock()
+    
+    def record(self, wallet_id, amount, created_at):
+        with self.lock:
+            window = self.windows.get(wallet_id)
+            if window is None:
+                window = self.windows[wallet_id] = WalletWindow()
+            # Integer cents so the running sums never drift
+            window.add(minute_index(created_at), to_cents(amount))
+    
+    def get_stats(self, wallet_id, now):
+        with self.lock:
+            window = self.windows.get(wallet_id)
+            if window is None:
+                return 0, 0.0
+            count, total = window.stats(minute_index(now))
+            return count, from_cents(total)
+    
+    def clear(self):
+        with self.lock:
+            self.windows.clear()
+
+_backend = InMemoryWindowBackend()
+_ready = False
+
+def set_backend(backend):
+    global _backend
+    _backend = backend
+
+def get_backend():
+    return _backend
+
+def is_ready():
+    return _ready
+
+def get_stats(wallet_id, now=None):
+    return _backend.get_stats(wallet_id, now or datetime.utcnow())
+
+def record(wallet_id, amount, created_at):
+    _backend.record(wallet_id, amount, created_at)
+
+def rebuild_from_db(now=None):
+    """Reload the last 24 hours of transactions into the backend"""
+    from models import db
+    from models.transaction import Transaction
+    
+    global _ready
+    now = now or datetime.utcnow()
+    _backend.clear()
+    rows = db.session.query(
+        Transaction.wallet_id, Transaction.amount, Transaction.created_at
+    ).filter(
+        Transaction.created_at >= now - timedelta(days=1)
+    ).order_by(Transaction.created_at).execution_options(yield_per=1000)
+    
+    count = 0
+    for row in rows:
+        _backend.record(row.wallet_id, row.amount, row.created_at)
+        count += 1
+    _ready = True
+    logger.info(f"Fraud window state rebuilt from {count} transactions")
+    return count
+
+def check_consistency(wallet_ids=None, now=None, tolerance=1e-6):
+    """Compare window state with SQL over the same minute-aligned windows.
+
+    Returns a list of mismatches; an empty list means the state is consistent.
+    """
+    from models import db
+    from models.transaction import Transaction
+    
+    now = now or datetime.utcnow()
+    current = minute_index(now)
+    epoch = datetime(1970, 1, 1)
+    hour_start = epoch + timedelta(minutes=current - HOUR_MINUTES + 1)
+    day_start = epoch + timedelta(minutes=current - DAY_MINUTES + 1)
+    
+    if wallet_ids is None:
+        wallet_ids = [w for (w,) in db.session.query(Transaction.wallet_id).filter(
+            Transaction.created_at >= day_start
+        ).distinct()]
+    
+    mismatches = []
+    for wallet_id in wallet_ids:
+        sql_count = Transaction.query.filter(
+            Transaction.wallet_id == wallet_id,
+            Transaction.created_at >= hour_start,
+            Transaction.created_at <= now
+        ).count()
+        sql_sum = db.session.query(func.sum(Transaction.amount)).filter(
+            Transaction.wallet_id == wallet_id,
+            Transaction.created_at >= day_start,
+            Transaction.created_at <= now
+        ).scalar() or 0
+        window_count, window_sum = get_stats(wallet_id, now)
+        if window_count != sql_count or abs(window_sum - sql_sum) > tolerance:
+            mismatches.append({
+                'wallet_id': wallet_id,
+                'window_recent_transfers': window_count,
+                'sql_recent_transfers': sql_count,
+                'window_daily_total': window_sum,
+                'sql_daily_total': float(sql_sum)
+            })
+    return mismatches
+
+def _after_flush(session, flush_context):
+    from models.transaction import Transaction
+    
+    pending = session.info.setdefault('fraud_window_pending', [])
+    for obj in session.new:
+        if isinstance(obj, Transaction):
+            pending.append((obj.wallet_id, obj.amount, obj.created_at))
+
+def _after_commit(session):
+    for wallet_id, amount, created_at in session.info.pop('fraud_window_pending', []):
+        record(wallet_id, amount, created_at)
+
+def _after_rollback(session):
+    session.info.pop('fraud_window_pending', None)
+
+def init_app(app):
+    """Hook window updates into session commits and warm the state from the DB"""
+    if not app.config.get('FRAUD_WINDOW_ENABLED'):
+        return
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+        event.listen(Session, 'after_commit', _after_commit)
+        event.listen(Session, 'after_rollback', _after_rollback)
+    
+    from models import db
+    with app.app_context():
+        rebuild_from_db()
+        db.session.remove()
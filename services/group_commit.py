@@ -0,0 +1,217 @@
+"""
+Group-commit writer for money-moving requests.
+
+Instead of committing its own transaction, a request hands its unit of work
+(the same function it would pass to run_with_retry) to a single writer thread
+and waits on a future. The writer gathers units for up to GROUP_COMMIT_WINDOW
+seconds or GROUP_COMMIT_MAX_BATCH items, runs each one inside a SAVEPOINT of a
+shared transaction, and commits the batch once, so many requests share one
+commit (and one fsync). A unit that raises, e.g. InsufficientFundsError, rolls
+back only its own savepoint and gets the exception on its future.
+
+If a unit hits a database error, or the COMMIT fails with a deadlock or
+serialization failure, nothing in the batch has committed: it is rolled back
+and every unit is rerun and committed on its own with run_with_retry. Any
+other COMMIT failure leaves the outcome unknown, so those units are failed
+rather than risk applying them twice.
+
+pysqlite does not open a transaction until the first write and treats the
+first SAVEPOINT as the outermost transaction, which would commit every unit
+separately. On SQLite the writer therefore applies SQLAlchemy's documented
+workaround to its own connections: the driver's transaction handling is
+switched off and BEGIN IMMEDIATE is emitted when each transaction starts.
+Other threads keep the driver's default, so their reads take no locks that
+would hold up the writer's COMMIT.
+
+The writer's session keeps objects loaded after commit and detaches them, so
+a returned Transaction can be read from the request thread. Only used when
+GROUP_COMMIT_ENABLED is set; otherwise execute() commits inline.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from models import db
+from services import metrics
+from services.balance_service import is_retryable, run_with_retry
+
+logger = logging.getLogger(__name__)
+
+class CommitFailed(Exception):
+    """COMMIT of a batch failed; wraps the database error"""
+    def __init__(self, error):
+        super().__init__(str(error))
+        self.error = error
+
+_local = threading.local()
+
+def _sqlite_begin(conn):
+    """On the writer thread, emit BEGIN ourselves so SAVEPOINTs nest inside a real transaction"""
+    dbapi_connection = conn.connection.dbapi_connection
+    if getattr(_local, 'explicit_transactions', False):
+        if dbapi_connection.isolation_level is not None:
+            dbapi_connection.isolation_level = None
+        conn.exec_driver_sql('BEGIN IMMEDIATE')
+    elif dbapi_connection.isolation_level is None:
+        # Connection last used by the writer; restore the driver's default
+        dbapi_connection.isolation_level = ''
+
+def use_explicit_transactions(engine):
+    if engine.dialect.name == 'sqlite' and not event.contains(engine, 'begin', _sqlite_begin):
+        event.listen(engine, 'begin', _sqlite_begin)
+
+class WorkItem:
+    def __init__(self, fn):
+        self.fn = fn
+        self.future = Future()
+        self.result = None
+        self.error = None
+
+class GroupCommitWriter:
+    def __init__(self, app, batch_window=0.005, batch_size=100):
+        self.app = app
+        self.batch_window = batch_window
+        self.batch_size = batch_size
+        self.queue = queue.Queue()
+        self.thread = None
+        self.stopping = threading.Event()
+    
+    def start(self):
+        with self.app.app_context():
+            use_explicit_transactions(db.engine)
+        self.thread = threading.Thread(target=self.run, name='group-commit-writer', daemon=True)
+        self.thread.start()
+    
+    def stop(self, timeout=5.0):
+        """Commit what is already queued, then stop the writer"""
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+    
+    def submit(self, fn):
+        """Queue a unit of work; the future resolves to fn's result once it is committed"""
+        item = WorkItem(fn)
+        self.queue.put(item)
+        return item.future
+    
+    def next_batch(self):
+        """Block for the first unit, then gather more for up to batch_window seconds"""
+        try:
+            first = self.queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+    
+    def run(self):
+        _local.explicit_transactions = True
+        with self.app.app_context():
+            # Results are handed to other threads, so keep them loaded after commit
+            db.session().expire_on_commit = False
+            try:
+                while not (self.stopping.is_set() and self.queue.empty()):
+                    batch = self.next_batch()
+                    if batch:
+                        self.process(batch)
+            finally:
+                db.session.remove()
+    
+    def process(self, batch):
+        start = time.monotonic()
+        try:
+            self.commit_batch(batch)
+        except DBAPIError as e:
+            # Raised by a unit before COMMIT was sent: nothing has committed
+            db.session.rollback()
+            logger.warning(f"Group commit of {len(batch)} units failed ({e.orig}); committing them one by one")
+            self.commit_individually(batch)
+        except CommitFailed as e:
+            db.session.rollback()
+            if is_retryable(e.error):
+                logger.warning(f"Group commit of {len(batch)} units was rolled back ({e.error.orig}); "
+                               f"committing them one by one")
+                self.commit_individually(batch)
+            else:
+                logger.error(f"Group commit of {len(batch)} units failed with an unknown outcome: {e.error}")
+                for item in batch:
+                    item.result, item.error = None, e.error
+        except Exception as e:
+            db.session.rollback()
+            logger.exception("Group commit failed")
+            for item in batch:
+                item.result, item.error = None, e
+        
+        db.session.expunge_all()
+        metrics.GROUP_COMMIT_BATCH_SIZE.observe(len(batch))
+        metrics.GROUP_COMMIT_SECONDS.observe(time.monotonic() - start)
+        for item in batch:
+            if item.error is not None:
+                item.future.set_exception(item.error)
+            else:
+                item.future.set_result(item.result)
+    
+    def commit_batch(self, batch):
+        for item in batch:
+            savepoint = db.session.begin_nested()
+            try:
+                item.result = item.fn()
+                savepoint.commit()
+            except DBAPIError:
+                raise
+            except Exception as e:
+                savepoint.rollback()
+                item.result, item.error = None, e
+        try:
+            db.session.commit()
+        except DBAPIError as e:
+            raise CommitFailed(e) from e
+    
+    def commit_individually(self, batch):
+        for item in batch:
+            try:
+                item.result, item.error = run_with_retry(item.fn), None
+            except Exception as e:
+                item.result, item.error = None, e
+
+_writer = None
+
+def get_writer():
+    return _writer
+
+def init_app(app):
+    """Start the writer thread (no-op unless GROUP_COMMIT_ENABLED)"""
+    global _writer
+    if not app.config.get('GROUP_COMMIT_ENABLED') or _writer is not None:
+        return _writer
+    
+    _writer = GroupCommitWriter(
+        app,
+        batch_window=app.config.get('GROUP_COMMIT_WINDOW', 0.005),
+        batch_size=app.config.get('GROUP_COMMIT_MAX_BATCH', 100)
+    )
+    _writer.start()
+    atexit.register(_writer.stop)
+    return _writer
+
+def execute(fn, timeout=None):
+    """
+    Run a unit of work and commit it: through the writer when it is running,
+    otherwise inline with run_with_retry. Exceptions raised by fn propagate.
+    """
+    if _writer is None:
+        return run_with_retry(fn)
+    return _writer.submit(fn).result(timeout)
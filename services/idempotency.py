@@ -0,0 +1,236 @@
+"""
+Idempotency-Key support for money-moving endpoints.
+
+A client that sends an Idempotency-Key header gets the same response for every
+retry of that request: the first request claims the key by inserting an
+idempotency_key row, runs, and stores its status and body on the row; retries
+replay the stored response without running fraud checks or touching balances.
+A retry that arrives while the first request is still running gets a 409, and
+reusing a key for a different request body gets a 422.
+
+Handlers that move money pass current_claim() into their unit of work and call
+save_response() there, so the response is written in the same database
+transaction as the balance change: once the money has moved the key is
+completed, and a retry can never run it again.
+
+Keys are scoped per user and kept for IDEMPOTENCY_TTL seconds. Completed
+responses are also cached in-process so hot retries skip the database. A claim
+left unfinished by a crashed worker (whose money movement therefore never
+committed) can be taken over after IDEMPOTENCY_LOCK_TIMEOUT seconds. Each
+claim carries a random token and every write to the row checks it, so a slow
+request whose claim was taken over cannot also save its response: its unit of
+work fails with ClaimLost and rolls back. Server errors release unfinished
+claims so the request can be retried normally.
+"""
+import hashlib
+import logging
+import secrets
+from collections import namedtuple
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import Response, current_app, g, jsonify, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from models import db
+from models.idempotency_key import IdempotencyKey
+from services import metrics
+from services.identity_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+StoredResponse = namedtuple('StoredResponse', ['request_hash', 'status', 'body', 'expires_at'])
+Claim = namedtuple('Claim', ['user_id', 'key', 'token'])
+
+class ClaimLost(Exception):
+    """The request's claim on its key was taken over by a retry"""
+    pass
+
+# (user_id, key) -> StoredResponse for completed requests
+_responses = TTLCache(maxsize=10000, ttl=300.0)
+
+def request_fingerprint():
+    """Hash of what makes two requests "the same" for a key: method, path and body"""
+    digest = hashlib.sha256(f'{request.method} {request.path}\n'.encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+def replay(stored, fingerprint):
+    if stored.request_hash != fingerprint:
+        metrics.IDEMPOTENCY_REQUESTS.inc(labels=('mismatch',))
+        return jsonify({'error': f'{HEADER} was already used for a different request'}), 422
+    metrics.IDEMPOTENCY_REQUESTS.inc(labels=('replayed',))
+    return Response(stored.body, status=stored.status, mimetype='application/json',
+                    headers={'Idempotent-Replayed': 'true'})
+
+def in_progress():
+    metrics.IDEMPOTENCY_REQUESTS.inc(labels=('in_progress',))
+    return jsonify({'error': f'A request with this {HEADER} is already in progress'}), 409
+
+def begin(user_id, key, fingerprint, token, now=None):
+    """
+    Claim key for the current request under token. Returns None when the caller
+    should run the request, otherwise the response to send instead.
+    """
+    now = now or datetime.utcnow()
+    stored = _responses.get((user_id, key))
+    if stored and stored.expires_at > now:
+        return replay(stored, fingerprint)
+    
+    claim = dict(
+        request_hash=fingerprint,
+        token=token,
+        response_status=None,
+        response_body=None,
+        created_at=now,
+        locked_until=now + timedelta(seconds=current_app.config.get('IDEMPOTENCY_LOCK_TIMEOUT', 60)),
+        expires_at=now + timedelta(seconds=current_app.config.get('IDEMPOTENCY_TTL', 86400))
+    )
+    # Take over an expired key or a claim abandoned by a crashed worker
+    result = db.session.execute(
+        update(IdempotencyKey)
+        .where(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.key == key,
+            or_(
+                IdempotencyKey.expires_at < now,
+                and_(IdempotencyKey.response_status.is_(None), IdempotencyKey.locked_until < now)
+            )
+        )
+        .values(**claim)
+    )
+    if result.rowcount == 1:
+        db.session.commit()
+        return None
+    try:
+        db.session.execute(insert(IdempotencyKey).values(user_id=user_id, key=key, **claim))
+        db.session.commit()
+        return None
+    except IntegrityError:
+        # Another request holds or has completed this key
+        db.session.rollback()
+    
+    record = db.session.execute(
+        select(IdempotencyKey.request_hash, IdempotencyKey.response_status,
+               IdempotencyKey.response_body, IdempotencyKey.expires_at)
+        .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+    ).first()
+    if record is None or record.response_status is None:
+        return in_progress()
+    stored = StoredResponse(record.request_hash, record.response_status, record.response_body, record.expires_at)
+    _responses.set((user_id, key), stored)
+    return replay(stored, fingerprint)
+
+def current_claim():
+    """Claim held by the current request, or None without an Idempotency-Key"""
+    return g.get('idempotency_claim')
+
+def owned(claim):
+    """Filter matching claim's row only while claim still holds it"""
+    return and_(IdempotencyKey.user_id == claim.user_id, IdempotencyKey.key == claim.key,
+                IdempotencyKey.token == claim.token)
+
+def save_response(claim, body, status=200):
+    """
+    Mark claim completed with its response inside the caller's transaction.
+    Works from any thread, e.g. inside a group-commit unit; no-op without a
+    claim. Raises ClaimLost if the claim was taken over, so the caller's
+    transaction rolls back instead of moving money a second time.
+    """
+    if claim is None:
+        return
+    result = db.session.execute(
+        update(IdempotencyKey)
+        .where(owned(claim), IdempotencyKey.response_status.is_(None))
+        .values(response_status=status, response_body=current_app.json.dumps(body))
+    )
+    if result.rowcount != 1:
+        raise ClaimLost(f'{HEADER} {claim.key!r} was taken over by another request')
+
+def complete(claim, fingerprint, response):
+    """
+    Store the response for claim, or release it if it was a server error.
+    A response already saved with the money movement is only refreshed.
+    """
+    if response.status_code >= 500:
+        release(claim)
+        return
+    body = response.get_data(as_text=True)
+    db.session.execute(
+        update(IdempotencyKey)
+        .where(owned(claim))
+        .values(response_status=response.status_code, response_body=body)
+    )
+    expires_at = db.session.execute(
+        select(IdempotencyKey.expires_at).where(owned(claim))
+    ).scalar()
+    db.session.commit()
+    if expires_at:
+        _responses.set((claim.user_id, claim.key), StoredResponse(fingerprint, response.status_code, body, expires_at))
+    metrics.IDEMPOTENCY_REQUESTS.inc(labels=('stored',))
+
+def release(claim):
+    db.session.execute(
+        delete(IdempotencyKey)
+        .where(owned(claim), IdempotencyKey.response_status.is_(None))
+    )
+    db.session.commit()
+
+def idempotent(fn):
+    """Honour an Idempotency-Key header on a view; must be applied under @jwt_required()"""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return fn(*args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': f'Invalid {HEADER}'}), 400
+        
+        user_id = str(get_jwt_identity())
+        fingerprint = request_fingerprint()
+        claim = Claim(user_id, key, secrets.token_hex(16))
+        response = begin(user_id, key, fingerprint, claim.token)
+        if response is not None:
+            return response
+        g.idempotency_claim = claim
+        
+        try:
+            response = current_app.make_response(fn(*args, **kwargs))
+        except ClaimLost:
+            db.session.rollback()
+            logger.warning(f"Idempotency claim for user {user_id} was taken over before it completed")
+            return in_progress()
+        except Exception:
+            db.session.rollback()
+            release(claim)
+            raise
+        complete(claim, fingerprint, response)
+        return response
+    return wrapper
+
+def sweep_expired(batch_size=1000, now=None):
+    """Delete expired keys in small batches; returns the number removed"""
+    now = now or datetime.utcnow()
+    removed = 0
+    while True:
+        keys = db.session.execute(
+            select(IdempotencyKey.user_id, IdempotencyKey.key)
+            .where(IdempotencyKey.expires_at < now)
+            .limit(batch_size)
+        ).all()
+        if not keys:
+            break
+        db.session.execute(
+            delete(IdempotencyKey)
+            .where(IdempotencyKey.expires_at < now, or_(*[
+                and_(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key) for user_id, key in keys
+            ]))
+        )
+        db.session.commit()
+        removed += len(keys)
+    if removed:
+        logger.info(f"Swept {removed} expired idempotency keys")
+    return removed
@@ -0,0 +1,119 @@
+"""
+Cached JWT identity resolution.
+
+Maps a user id to a small read-only identity record (user fields needed to
+authorize and render the profile, plus the wallet id) so hot endpoints do not
+query the user and wallet tables on every request. Records are cached per
+request in flask.g and process-wide in a TTL-bounded LRU. Local changes to a
+user or wallet invalidate the entry on flush; other processes see them once
+the TTL expires.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from flask import g, has_app_context, current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import db
+from models.user import User
+from models.wallet import Wallet
+
+Identity = namedtuple('Identity', [
+    'user_id', 'email', 'first_name', 'last_name', 'is_admin', 'is_active', 'is_deleted',
+    'created_at', 'updated_at', 'wallet_id'
+])
+
+class TTLCache:
+    def __init__(self, maxsize=10000, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+    
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+    
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+_cache = TTLCache()
+
+def identity_to_dict(identity):
+    """Same shape as User.to_dict"""
+    return {
+        'id': identity.user_id,
+        'email': identity.email,
+        'first_name': identity.first_name,
+        'last_name': identity.last_name,
+        'is_active': identity.is_active,
+        'is_admin': identity.is_admin,
+        'created_at': identity.created_at.isoformat(),
+        'updated_at': identity.updated_at.isoformat()
+    }
+
+def load_identity(user_id):
+    row = db.session.query(
+        User.id, User.email, User.first_name, User.last_name, User.is_admin, User.is_active,
+        User.is_deleted, User.created_at, User.updated_at, Wallet.id
+    ).outerjoin(Wallet, Wallet.user_id == User.id).filter(User.id == user_id).first()
+    return Identity(*row) if row else None
+
+def get_identity(user_id):
+    """Resolve a JWT identity to an Identity record, or None if the user does not exist"""
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    
+    request_cache = g.setdefault('identity_cache', {})
+    if user_id in request_cache:
+        return request_cache[user_id]
+    
+    enabled = current_app.config.get('IDENTITY_CACHE_ENABLED', True)
+    identity = _cache.get(user_id) if enabled else None
+    if identity is None:
+        identity = load_identity(user_id)
+        if identity is not None and enabled:
+            _cache.set(user_id, identity)
+    request_cache[user_id] = identity
+    return identity
+
+def invalidate(user_id):
+    _cache.delete(user_id)
+    if has_app_context():
+        g.pop('identity_cache', None)
+
+def _after_flush(session, flush_context):
+    # Any local change to a user or wallet row drops its cached identity
+    for obj in list(session.dirty) + list(session.deleted) + list(session.new):
+        if isinstance(obj, User) and obj.id is not None:
+            invalidate(obj.id)
+        elif isinstance(obj, Wallet) and obj.user_id is not None:
+            invalidate(obj.user_id)
+
+def init_app(app):
+    _cache.maxsize = app.config.get('IDENTITY_CACHE_SIZE', 10000)
+    _cache.ttl = app.config.get('IDENTITY_CACHE_TTL', 60)
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
@@ -0,0 +1,79 @@
+"""
+DB-backed leader lock for scheduled jobs.
+
+Each job holds a lease row in job_lock. An instance may take the lease when
+the row is missing, expired, or already its own, so only one scheduler
+process runs a job even if several are started by mistake. A lease is kept
+after the job finishes, so instances whose trigger for the same run fires a
+little later skip it; callers pick a TTL shorter than the job's period so the
+next run can take it again. A crashed leader is replaced once its lease expires.
+"""
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+from functools import wraps
+from sqlalchemy import insert, update, or_
+from sqlalchemy.exc import IntegrityError
+from models import db
+from models.job_lock import JobLock
+
+logger = logging.getLogger(__name__)
+
+OWNER = f'{socket.gethostname()}:{os.getpid()}'
+
+def acquire(name, ttl, owner=OWNER, now=None):
+    """Take or renew the lease for name; True if this owner now holds it"""
+    now = now or datetime.utcnow()
+    locked_until = now + timedelta(seconds=ttl)
+    result = db.session.execute(
+        update(JobLock)
+        .where(JobLock.name == name, or_(JobLock.locked_until < now, JobLock.owner == owner))
+        .values(owner=owner, locked_until=locked_until, acquired_at=now)
+    )
+    if result.rowcount == 1:
+        db.session.commit()
+        return True
+    try:
+        db.session.execute(insert(JobLock).values(
+            name=name, owner=owner, locked_until=locked_until, acquired_at=now
+        ))
+        db.session.commit()
+        return True
+    except IntegrityError:
+        # Row exists and is held by someone else
+        db.session.rollback()
+        return False
+
+def release(name, owner=OWNER):
+    db.session.execute(
+        update(JobLock)
+        .where(JobLock.name == name, JobLock.owner == owner)
+        .values(locked_until=datetime.utcnow())
+    )
+    db.session.commit()
+
+def leader_only(name, ttl):
+    """
+    Run the wrapped job only if this instance wins the lease; needs an app context.
+    The lease is held until it expires after a successful run and released after
+    a failed one, so another instance can retry.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not acquire(name, ttl):
+                logger.info(f"Skipping {name}: lease held by another instance")
+                return None
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                db.session.rollback()
+                try:
+                    release(name)
+                except Exception:
+                    db.session.rollback()
+                    logger.exception(f"Could not release the lease for {name}")
+                raise
+        return wrapper
+    return decorator
@@ -0,0 +1,223 @@
+"""
+Append-only double-entry ledger.
+
+With LEDGER_ENABLED every transaction insert also writes its ledger postings
+(external -> wallet for deposits, wallet -> external for withdrawals, sender ->
+receiver for transfers) in the same database transaction. Balances are derived
+as the wallet's last snapshot plus the sum of its entries not yet folded into
+it, so credits are plain inserts that never lock the receiving wallet's row,
+and an audit only reads the unfolded tail. Each entry is marked folded in the
+same transaction that adds it to the snapshot, so an entry that commits late
+(a slow lock wait, or clock skew between the web and scheduler hosts) is
+still counted exactly once.
+
+wallet.balance stays as a cached value refreshed by snapshot_balances; reads
+that need the exact balance go through get_balance.
+"""
+import logging
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, func, insert, bindparam, select, type_coerce, update
+from sqlalchemy.orm import Session
+from models import db
+from models.money import Money, cents, from_cents
+from models.ledger import LedgerEntry, BalanceSnapshot
+from models.wallet import Wallet
+
+logger = logging.getLogger(__name__)
+
+_enabled = False
+
+def is_enabled():
+    return _enabled
+
+def postings(transaction_id, wallet_id, receiver_wallet_id, amount, transaction_type, created_at=None):
+    """Ledger entries for one transaction; wallet_id None is the external account"""
+    created_at = created_at or datetime.utcnow()
+    if transaction_type == 'deposit':
+        source, target = None, wallet_id
+    elif transaction_type == 'withdrawal':
+        source, target = wallet_id, None
+    else:
+        source, target = wallet_id, receiver_wallet_id
+    return [
+        {'transaction_id': transaction_id, 'wallet_id': source, 'entry_type': 'debit',
+         'amount': -amount, 'created_at': created_at},
+        {'transaction_id': transaction_id, 'wallet_id': target, 'entry_type': 'credit',
+         'amount': amount, 'created_at': created_at},
+    ]
+
+def record_transactions(connection, transactions):
+    """Post (id, wallet_id, receiver_wallet_id, amount, transaction_type, created_at) rows with one bulk insert"""
+    entries = [entry for transaction in transactions for entry in postings(*transaction)]
+    if entries:
+        connection.execute(insert(LedgerEntry), entries)
+
+def _after_flush(session, flush_context):
+    if not _enabled:
+        return
+    from models.transaction import Transaction
+    
+    transactions = [
+        (obj.id, obj.wallet_id, obj.receiver_wallet_id, obj.amount, obj.transaction_type, obj.created_at)
+        for obj in session.new if isinstance(obj, Transaction)
+    ]
+    if transactions:
+        record_transactions(session.connection(), transactions)
+
+def get_balance(wallet_id):
+    """Exact balance: last snapshot plus the sum of unfolded entries"""
+    balance = db.session.query(cents(BalanceSnapshot.balance)).filter(
+        BalanceSnapshot.wallet_id == wallet_id
+    ).scalar() or 0
+    tail = db.session.query(cents(func.coalesce(func.sum(LedgerEntry.amount), 0))).filter(
+        LedgerEntry.wallet_id == wallet_id,
+        LedgerEntry.folded == False
+    ).scalar()
+    return from_cents(int(balance) + int(tail))
+
+def balance_expression(wallet_id_column=Wallet.id):
+    """
+    get_balance as a correlated SQL expression for queries over many wallets:
+    the wallet's snapshot plus the sum of its unfolded entries
+    """
+    snapshot_balance = select(BalanceSnapshot.balance).where(
+        BalanceSnapshot.wallet_id == wallet_id_column
+    ).correlate(Wallet).scalar_subquery()
+    tail = select(func.sum(LedgerEntry.amount)).where(
+        LedgerEntry.wallet_id == wallet_id_column,
+        LedgerEntry.folded == False
+    ).correlate(Wallet).scalar_subquery()
+    return type_coerce(func.coalesce(snapshot_balance, 0) + func.coalesce(tail, 0), Money)
+
+def snapshot_balances(lag_seconds=None, now=None):
+    """
+    Fold settled entries into each wallet's snapshot, mark them folded, and
+    refresh the cached wallet.balance, all in one transaction. Entries newer
+    than lag_seconds are left in the tail only to keep the job away from hot
+    rows; correctness does not depend on the lag. Returns the number of
+    wallets updated.
+    """
+    if lag_seconds is None:
+        lag_seconds = current_app.config.get('LEDGER_SNAPSHOT_LAG', 60)
+    cutoff = (now or datetime.utcnow()) - timedelta(seconds=lag_seconds)
+    entries = db.session.query(
+        LedgerEntry.id, LedgerEntry.wallet_id, cents(LedgerEntry.amount)
+    ).filter(
+        LedgerEntry.wallet_id.isnot(None),
+        LedgerEntry.folded == False,
+        LedgerEntry.created_at < cutoff
+    ).all()
+    if not entries:
+        return 0
+    
+    # Sum exactly the entries that get marked below
+    totals = {}
+    last_ids = {}
+    for entry_id, wallet_id, amount in entries:
+        totals[wallet_id] = totals.get(wallet_id, 0) + int(amount)
+        last_ids[wallet_id] = max(last_ids.get(wallet_id, 0), entry_id)
+    deltas = list(totals.items())
+    
+    entry_ids = [entry_id for entry_id, _, _ in entries]
+    folded = 0
+    for start in range(0, len(entry_ids), 1000):
+        folded += db.session.execute(
+            update(LedgerEntry)
+            .where(LedgerEntry.id.in_(entry_ids[start:start + 1000]), LedgerEntry.folded == False)
+            .values(folded=True)
+        ).rowcount
+    if folded != len(entry_ids):
+        # Another snapshot run folded some of them first; leave it to that run
+        db.session.rollback()
+        logger.warning("Ledger entries were folded by a concurrent snapshot; skipping this run")
+        return 0
+    
+    existing = {
+        wallet_id: (balance, last_entry_id) for wallet_id, balance, last_entry_id in db.session.query(
+            BalanceSnapshot.wallet_id, cents(BalanceSnapshot.balance), BalanceSnapshot.last_entry_id
+        ).filter(BalanceSnapshot.wallet_id.in_([wallet_id for wallet_id, _ in deltas]))
+    }
+    now = datetime.utcnow()
+    updates = [
+        {'target_id': wallet_id, 'new_balance': from_cents(int(existing[wallet_id][0]) + delta),
+         'new_last_entry_id': max(existing[wallet_id][1], last_ids[wallet_id])}
+        for wallet_id, delta in deltas if wallet_id in existing
+    ]
+    inserts = [
+        {'wallet_id': wallet_id, 'balance': from_cents(delta), 'last_entry_id': last_ids[wallet_id], 'created_at': now}
+        for wallet_id, delta in deltas if wallet_id not in existing
+    ]
+    snapshot_table = BalanceSnapshot.__table__
+    if updates:
+        db.session.execute(
+            snapshot_table.update()
+            .where(snapshot_table.c.wallet_id == bindparam('target_id'))
+            .values(balance=bindparam('new_balance'),
+                    last_entry_id=bindparam('new_last_entry_id'), created_at=now),
+            updates
+        )
+    if inserts:
+        db.session.execute(insert(BalanceSnapshot), inserts)
+    
+    # Refresh the cached column with the full balance (snapshot + unsettled tail)
+    wallet_table = Wallet.__table__
+    db.session.execute(
+        wallet_table.update()
+        .where(wallet_table.c.id == bindparam('target_id'))
+        .values(balance=bindparam('new_balance'), updated_at=now),
+        [{'target_id': wallet_id, 'new_balance': get_balance(wallet_id)} for wallet_id, _ in deltas]
+    )
+    db.session.commit()
+    logger.info(f"Snapshotted {len(deltas)} wallet balances, folding {len(entry_ids)} ledger entries")
+    return len(deltas)
+
+def open_ledger():
+    """
+    Post an opening balance for every wallet that has no ledger entries yet, taken
+    from wallet.balance. Run with writes stopped, before enabling LEDGER_ENABLED.
+    """
+    has_entries = db.session.query(LedgerEntry.id).filter(LedgerEntry.wallet_id == Wallet.id).exists()
+    wallets = db.session.query(Wallet.id, Wallet.balance).filter(
+        ~has_entries, Wallet.balance != 0
+    ).all()
+    now = datetime.utcnow()
+    entries = []
+    for wallet_id, balance in wallets:
+        entries.append({'transaction_id': None, 'wallet_id': None, 'entry_type': 'debit',
+                        'amount': -balance, 'created_at': now})
+        entries.append({'transaction_id': None, 'wallet_id': wallet_id, 'entry_type': 'credit',
+                        'amount': balance, 'created_at': now})
+    for start in range(0, len(entries), 10000):
+        db.session.execute(insert(LedgerEntry), entries[start:start + 10000])
+    db.session.commit()
+    logger.info(f"Posted opening balances for {len(wallets)} wallets")
+    return len(wallets)
+
+def unbalanced_postings():
+    """Transactions whose ledger legs do not sum to exactly zero"""
+    return db.session.query(
+        LedgerEntry.transaction_id, func.sum(LedgerEntry.amount)
+    ).filter(
+        LedgerEntry.transaction_id.isnot(None)
+    ).group_by(LedgerEntry.transaction_id).having(
+        cents(func.sum(LedgerEntry.amount)) != 0
+    ).all()
+
+def audit_wallet(wallet_id):
+    snapshot = db.session.get(BalanceSnapshot, wallet_id)
+    cached = db.session.query(Wallet.balance).filter(Wallet.id == wallet_id).scalar()
+    return {
+        'wallet_id': wallet_id,
+        'ledger_balance': get_balance(wallet_id),
+        'snapshot_balance': snapshot.balance if snapshot else 0.0,
+        'snapshot_entry_id': snapshot.last_entry_id if snapshot else 0,
+        'cached_balance': cached
+    }
+
+def init_app(app):
+    """Write ledger postings for every ORM transaction insert when LEDGER_ENABLED is set"""
+    global _enabled
+    _enabled = app.config.get('LEDGER_ENABLED', False)
+    if _enabled and not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
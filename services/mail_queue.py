@@ -0,0 +1,267 @@
+"""
+Outbound notification queue.
+
+Request handlers and scans enqueue messages and return immediately; a pool of
+background worker threads drains the queue, coalesces messages for the same
+recipient into one email, delivers through a transport that keeps its SMTP
+connection open between batches, and retries failed deliveries with backoff.
+"""
+import atexit
+import logging
+import queue
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+
+logger = logging.getLogger(__name__)
+
+class OutboundMessage:
+    def __init__(self, recipient, subject, body):
+        self.recipient = recipient
+        self.subject = subject
+        self.body = body
+        self.enqueued_at = time.monotonic()
+        self.attempts = 0
+
+class LogTransport:
+    """Mock transport that writes emails to the log"""
+    
+    def send(self, recipient, subject, body):
+        logger.info(f"""
+
+MOCK EMAIL SENT
+{'='*50}
+To: {recipient}
+Subject: {subject}
+Message:
+{body}
+{'='*50}
+""")
+    
+    def close(self):
+        pass
+
+class MemoryTransport:
+    """Fake SMTP sink that keeps delivered emails in memory, for tests"""
+    
+    def __init__(self):
+        self.sent = []
+        self.lock = threading.Lock()
+    
+    def send(self, recipient, subject, body):
+        with self.lock:
+            self.sent.append({'to': recipient, 'subject': subject, 'body': body})
+    
+    def close(self):
+        pass
+
+class SMTPTransport:
+    """SMTP transport that reuses one connection until it fails or goes idle"""
+    
+    def __init__(self, host, port, sender, use_tls=True, username=None, password=None, timeout=10):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.use_tls = use_tls
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.connection = None
+    
+    def connect(self):
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            connection.starttls()
+        if self.username:
+            connection.login(self.username, self.password)
+        return connection
+    
+    def send(self, recipient, subject, body):
+        message = EmailMessage()
+        message['From'] = self.sender
+        message['To'] = recipient
+        message['Subject'] = subject
+        message.set_content(body)
+        if self.connection is None:
+            self.connection = self.connect()
+        try:
+            self.connection.send_message(message)
+        except (smtplib.SMTPServerDisconnected, OSError):
+            # Drop the broken connection; the queue retries the delivery
+            self.close()
+            raise
+    
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.quit()
+            except Exception:
+                pass
+            self.connection = None
+
+class MailQueue:
+    def __init__(self, transport_factory, workers=2, batch_window=0.5, batch_size=100,
+                 max_retries=5, retry_backoff=1.0):
+        self.transport_factory = transport_factory
+        self.workers = workers
+        self.batch_window = batch_window
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.queue = queue.Queue()
+        self.threads = []
+        self.stopping = threading.Event()
+        self.metrics_lock = threading.Lock()
+        self.metrics = {
+            'enqueued': 0,
+            'sent': 0,
+            'coalesced': 0,
+            'retries': 0,
+            'failed': 0,
+            'latency_seconds_sum': 0.0,
+            'latency_seconds_max': 0.0
+        }
+    
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self.run_worker, name=f'mail-worker-{i}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+    
+    def stop(self, timeout=5.0):
+        """Deliver what is already queued, then stop the workers"""
+        self.stopping.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+    
+    def enqueue(self, recipient, subject, body):
+        self.queue.put(OutboundMessage(recipient, subject, body))
+        self.count('enqueued')
+    
+    def count(self, name, value=1):
+        with self.metrics_lock:
+            self.metrics[name] += value
+    
+    def get_metrics(self):
+        with self.metrics_lock:
+            metrics = dict(self.metrics)
+        metrics['queue_depth'] = self.queue.qsize()
+        metrics['workers'] = len(self.threads)
+        return metrics
+    
+    def next_batch(self):
+        """Block for the first message, then gather more for up to batch_window seconds"""
+        try:
+            first = self.queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+    
+    def run_worker(self):
+        transport = self.transport_factory()
+        try:
+            while not (self.stopping.is_set() and self.queue.empty()):
+                batch = self.next_batch()
+                if batch:
+                    self.deliver(transport, batch)
+        finally:
+            transport.close()
+    
+    def deliver(self, transport, batch):
+        # Coalesce every message for the same recipient into a single email
+        by_recipient = {}
+        for message in batch:
+            by_recipient.setdefault(message.recipient, []).append(message)
+        
+        for recipient, messages in by_recipient.items():
+            if len(messages) == 1:
+                subject, body = messages[0].subject, messages[0].body
+            else:
+                subject = f"{len(messages)} notifications from Digital Wallet"
+                body = f"\n{'-'*50}\n".join(f"{m.subject}\n\n{m.body}" for m in messages)
+                self.count('coalesced', len(messages) - 1)
+            
+            try:
+                transport.send(recipient, subject, body)
+            except Exception as e:
+                self.retry(messages, e)
+                continue
+            
+            now = time.monotonic()
+            with self.metrics_lock:
+                self.metrics['sent'] += len(messages)
+                for m in messages:
+                    latency = now - m.enqueued_at
+                    self.metrics['latency_seconds_sum'] += latency
+                    self.metrics['latency_seconds_max'] = max(self.metrics['latency_seconds_max'], latency)
+    
+    def retry(self, messages, error):
+        for message in messages:
+            message.attempts += 1
+            if message.attempts > self.max_retries:
+                logger.error(f"Giving up on email to {message.recipient} after {message.attempts} attempts: {error}")
+                self.count('failed')
+                continue
+            delay = self.retry_backoff * (2 ** (message.attempts - 1))
+            logger.warning(f"Email to {message.recipient} failed ({error}); retrying in {delay:.1f}s")
+            self.count('retries')
+            timer = threading.Timer(delay, self.queue.put, args=(message,))
+            timer.daemon = True
+            timer.start()
+
+_mail_queue = None
+
+def get_queue():
+    return _mail_queue
+
+def create_transport_factory(config):
+    backend = config.get('MAIL_BACKEND', 'log')
+    if backend == 'smtp':
+        return lambda: SMTPTransport(
+            config['MAIL_SERVER'],
+            config['MAIL_PORT'],
+            config.get('MAIL_DEFAULT_SENDER') or config.get('MAIL_USERNAME') or 'no-reply@digitalwallet.local',
+            use_tls=config.get('MAIL_USE_TLS', True),
+            username=config.get('MAIL_USERNAME'),
+            password=config.get('MAIL_PASSWORD')
+        )
+    if backend == 'memory':
+        sink = MemoryTransport()
+        return lambda: sink
+    return LogTransport
+
+def init_app(app):
+    """Start the background delivery workers (no-op unless MAIL_QUEUE_ENABLED)"""
+    global _mail_queue
+    if not app.config.get('MAIL_QUEUE_ENABLED') or _mail_queue is not None:
+        return _mail_queue
+    
+    _mail_queue = MailQueue(
+        create_transport_factory(app.config),
+        workers=app.config.get('MAIL_QUEUE_WORKERS', 2),
+        batch_window=app.config.get('MAIL_QUEUE_BATCH_WINDOW', 0.5),
+        max_retries=app.config.get('MAIL_QUEUE_MAX_RETRIES', 5),
+        retry_backoff=app.config.get('MAIL_QUEUE_RETRY_BACKOFF', 1.0)
+    )
+    _mail_queue.start()
+    atexit.register(_mail_queue.stop)
+    return _mail_queue
+
+def send_or_enqueue(recipient, subject, body):
+    """Queue an email if the worker pool is running, otherwise log it inline"""
+    if _mail_queue is not None:
+        _mail_queue.enqueue(recipient, subject, body)
+    else:
+        LogTransport().send(recipient, subject, body)
@@ -0,0 +1,258 @@
+"""
+Prometheus-style metrics.
+
+A small in-process registry of counters and histograms rendered in the text
+exposition format at /metrics. Recording is a dict lookup, a bisect and a few
+additions under a lock, so instrumenting the hot path costs a few microseconds.
+Processes without the web app (the scheduler worker) serve the same registry
+from a small background HTTP listener instead.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from flask import g, request, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+JOB_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 1800.0, 3600.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(names, values, extra=None):
+    pairs = [f'{n}="{escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+    
+    def inc(self, amount=1, labels=()):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+    
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self.lock:
+            items = list(self.values.items())
+        for labels, value in items:
+            lines.append(f'{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}')
+        return lines
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series = {}  # labels -> [bucket counts..., sum, count]
+        self.lock = threading.Lock()
+    
+    def observe(self, value, labels=()):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+    
+    def time(self, labels=()):
+        """Decorator recording the wrapped function's duration"""
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - start, labels)
+            return wrapper
+        return decorator
+    
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            items = [(labels, list(series)) for labels, series in self.series.items()]
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = f'le="{format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{format_labels(self.labelnames, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{format_labels(self.labelnames, labels)} {format_value(series[-2])}')
+            lines.append(f'{self.name}_count{format_labels(self.labelnames, labels)} {series[-1]}')
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+    
+    def counter(self, *args, **kwargs):
+        metric = Counter(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+    
+    def histogram(self, *args, **kwargs):
+        metric = Histogram(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+    
+    def add_collector(self, collector):
+        """collector() returns (name, type, help, value) tuples rendered on every scrape"""
+        if collector not in self.collectors:
+            self.collectors.append(collector)
+    
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            for name, metric_type, documentation, value in collector():
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {metric_type}')
+                lines.append(f'{name} {format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by blueprint and endpoint',
+    ('blueprint', 'endpoint', 'method', 'status'))
+REQUEST_DB_QUERIES = registry.histogram(
+    'http_request_db_queries', 'Number of SQL statements issued per request',
+    ('blueprint', 'endpoint'), buckets=COUNT_BUCKETS)
+REQUEST_DB_SECONDS = registry.histogram(
+    'http_request_db_seconds', 'Time spent in SQL statements per request', ('blueprint', 'endpoint'))
+DB_QUERY_SECONDS = registry.histogram('db_query_duration_seconds', 'SQL statement latency')
+FRAUD_CHECK_SECONDS = registry.histogram('fraud_check_duration_seconds', 'Synchronous fraud check latency')
+JOB_SECONDS = registry.histogram(
+    'scheduler_job_duration_seconds', 'Scheduled job duration', ('job',), buckets=JOB_BUCKETS)
+GROUP_COMMIT_BATCH_SIZE = registry.histogram(
+    'group_commit_batch_size', 'Units of work committed together by the group-commit writer',
+    buckets=COUNT_BUCKETS)
+GROUP_COMMIT_SECONDS = registry.histogram('group_commit_duration_seconds', 'Time to run and commit one batch')
+IDEMPOTENCY_REQUESTS = registry.counter(
+    'idempotency_requests_total', 'Requests carrying an Idempotency-Key by outcome', ('outcome',))
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_start = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_metrics_start', None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    DB_QUERY_SECONDS.observe(elapsed)
+    if getattr(_local, 'active', False):
+        _local.queries += 1
+        _local.query_seconds += elapsed
+
+def _before_request():
+    g._metrics_start = time.perf_counter()
+    _local.active = True
+    _local.queries = 0
+    _local.query_seconds = 0.0
+
+def _after_request(response):
+    start = g.pop('_metrics_start', None)
+    if start is not None:
+        blueprint = request.blueprint or ''
+        endpoint = request.endpoint or 'unmatched'
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            (blueprint, endpoint, request.method, str(response.status_code))
+        )
+        REQUEST_DB_QUERIES.observe(_local.queries, (blueprint, endpoint))
+        REQUEST_DB_SECONDS.observe(_local.query_seconds, (blueprint, endpoint))
+    _local.active = False
+    return response
+
+def _collect_pool():
+    from models import db
+    from services import pool_metrics
+    metrics = pool_metrics.get_metrics(db.engine)
+    samples = []
+    for key, value in metrics.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            samples.append((f'db_pool_{key}', 'gauge', f'Connection pool {key}', value))
+    return samples
+
+def _collect_mail_queue():
+    from services import mail_queue
+    queue = mail_queue.get_queue()
+    if queue is None:
+        return []
+    return [
+        (f'mail_queue_{key}', 'gauge', f'Mail queue {key}', value)
+        for key, value in queue.get_metrics().items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    ]
+
+def _install_hooks():
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    registry.add_collector(_collect_pool)
+    registry.add_collector(_collect_mail_queue)
+
+def init_app(app):
+    """Install request hooks, SQL timing and the /metrics endpoint"""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    _install_hooks()
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    
+    @app.route('/metrics')
+    def metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+def start_http_server(app, port, host='0.0.0.0'):
+    """Serve /metrics from a background thread, for processes without the web app"""
+    if not app.config.get('METRICS_ENABLED', True) or not port:
+        return None
+    _install_hooks()
+    
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            with app.app_context():
+                body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            pass
+    
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
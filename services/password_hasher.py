@@ -0,0 +1,78 @@
+"""
+Password hashing off the request thread.
+
+bcrypt runs in a dedicated process pool so CPU-bound hashing does not pin the
+web worker's interpreter. The work factor comes from BCRYPT_LOG_ROUNDS, and
+hashes made with a different factor are reported by needs_rehash so login can
+upgrade them transparently.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import bcrypt as bcrypt_lib
+from flask import current_app, has_app_context
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROUNDS = 12
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def _hash(password, rounds):
+    return bcrypt_lib.hashpw(password.encode('utf-8'), bcrypt_lib.gensalt(rounds, prefix=b'2b')).decode('utf-8')
+
+def _check(password_hash, password):
+    return bcrypt_lib.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+def get_config(key, default):
+    return current_app.config.get(key, default) if has_app_context() else default
+
+def get_pool():
+    """Process pool for hashing, created lazily per OS process (None when disabled)"""
+    global _pool, _pool_pid
+    workers = get_config('PASSWORD_HASH_WORKERS', 0)
+    if not workers:
+        return None
+    with _pool_lock:
+        # A forked web worker must not reuse its parent's pool
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _pool_pid = os.getpid()
+        return _pool
+
+def run(fn, *args):
+    pool = get_pool()
+    if pool is None:
+        return fn(*args)
+    return pool.submit(fn, *args).result()
+
+def get_rounds():
+    return get_config('BCRYPT_LOG_ROUNDS', DEFAULT_ROUNDS)
+
+def hash_password(password):
+    return run(_hash, password, get_rounds())
+
+def check_password(password_hash, password):
+    if not password_hash:
+        return False
+    return run(_check, password_hash, password)
+
+def hash_rounds(password_hash):
+    """Work factor encoded in a bcrypt hash ($2b$<rounds>$...)"""
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+def needs_rehash(password_hash):
+    return hash_rounds(password_hash) != get_rounds()
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown(wait=False)
+        _pool = None
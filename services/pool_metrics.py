@@ -0,0 +1,91 @@
+"""
+Connection pool instrumentation.
+
+Engines use InstrumentedQueuePool, which times how long each checkout waits for
+a connection and counts timeouts, overflow checkouts and invalidations, so pool
+starvation shows up in metrics before it shows up as request latency.
+"""
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+SLOW_CHECKOUT_SECONDS = 0.1
+
+_lock = threading.Lock()
+_counters = {
+    'checkouts': 0,
+    'checkout_wait_seconds_sum': 0.0,
+    'checkout_wait_seconds_max': 0.0,
+    'slow_checkouts': 0,
+    'checkout_timeouts': 0,
+    'overflow_checkouts': 0,
+    'connections_opened': 0,
+    'connections_invalidated': 0
+}
+
+def _add(name, value=1):
+    with _lock:
+        _counters[name] += value
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection"""
+    
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            _add('checkout_timeouts')
+            raise
+        waited = time.perf_counter() - start
+        with _lock:
+            _counters['checkouts'] += 1
+            _counters['checkout_wait_seconds_sum'] += waited
+            _counters['checkout_wait_seconds_max'] = max(_counters['checkout_wait_seconds_max'], waited)
+            if waited >= SLOW_CHECKOUT_SECONDS:
+                _counters['slow_checkouts'] += 1
+            if self.checkedout() > self.size():
+                _counters['overflow_checkouts'] += 1
+        return connection
+
+@event.listens_for(InstrumentedQueuePool, 'connect')
+def _on_connect(dbapi_connection, connection_record):
+    _add('connections_opened')
+
+@event.listens_for(InstrumentedQueuePool, 'invalidate')
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    _add('connections_invalidated')
+
+def is_memory_sqlite(uri):
+    """True for in-memory SQLite URLs (sqlite://, sqlite:///:memory:, mode=memory), which use a static pool"""
+    url = make_url(uri)
+    if url.get_backend_name() != 'sqlite':
+        return False
+    return not url.database or ':memory:' in url.database or url.query.get('mode') == 'memory'
+
+def init_app(app):
+    """Select the instrumented pool; must run before the SQLAlchemy engine is created"""
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI', '')
+    if is_memory_sqlite(uri):
+        return
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    options.setdefault('poolclass', InstrumentedQueuePool)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+def get_metrics(engine):
+    with _lock:
+        metrics = dict(_counters)
+    pool = engine.pool
+    if isinstance(pool, QueuePool):
+        metrics.update({
+            'pool_size': pool.size(),
+            'in_use': pool.checkedout(),
+            'idle': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+            'max_overflow': pool._max_overflow
+        })
+    metrics['pool_class'] = type(pool).__name__
+    return metrics
@@ -0,0 +1,174 @@
+"""
+Opt-in slow-query and N+1 detector.
+
+Records every SQL statement issued during a request or a profiled job, groups
+them by normalized shape and flags shapes repeated more than
+QUERY_PROFILER_REPEAT_THRESHOLD times (the usual N+1 signature) as well as
+statements slower than QUERY_PROFILER_SLOW_MS. Requests get an X-Query-Profile
+header; anything flagged is logged as a warning. Nothing is registered unless
+QUERY_PROFILER_ENABLED is set.
+"""
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_settings = {'enabled': False, 'repeat_threshold': 5, 'slow_seconds': 0.1, 'header': True}
+_local = threading.local()
+
+MAX_SLOW = 20
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*\?\s*,?)+\)|\bIN\s*\((?:\s*%\(\w+\)s\s*,?)+\)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+@lru_cache(maxsize=1024)
+def normalize(statement):
+    """Collapse literals, IN lists and whitespace so repeated shapes group together"""
+    shape = _STRING.sub('?', statement)
+    shape = _NUMBER.sub('?', shape)
+    shape = _IN_LIST.sub('IN (...)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+class Profile:
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.count = 0
+        self.total = 0.0
+        self.shapes = {}  # normalized statement -> [count, total seconds]
+        self.slow = []
+    
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.total += elapsed
+        # Normalizing is deferred to report(); raw statements repeat verbatim
+        entry = self.shapes.get(statement)
+        if entry is None:
+            self.shapes[statement] = [1, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+        if elapsed >= _settings['slow_seconds'] and len(self.slow) < MAX_SLOW:
+            self.slow.append((statement, elapsed))
+    
+    def report(self):
+        grouped = {}
+        for statement, (count, total) in self.shapes.items():
+            entry = grouped.setdefault(normalize(statement), [0, 0.0])
+            entry[0] += count
+            entry[1] += total
+        threshold = _settings['repeat_threshold']
+        repeated = sorted(
+            ({'statement': shape, 'count': count, 'total_ms': round(total * 1000, 2)}
+             for shape, (count, total) in grouped.items() if count > threshold),
+            key=lambda item: item['count'], reverse=True
+        )
+        return {
+            'name': self.name,
+            'queries': self.count,
+            'query_ms': round(self.total * 1000, 2),
+            'elapsed_ms': round((time.perf_counter() - self.started) * 1000, 2),
+            'distinct': len(grouped),
+            'repeated': repeated,
+            'slow': [
+                {'statement': normalize(statement), 'ms': round(elapsed * 1000, 2)}
+                for statement, elapsed in self.slow
+            ]
+        }
+
+def current_profile():
+    return getattr(_local, 'profile', None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if getattr(_local, 'profile', None) is not None:
+        context._profiler_start = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = getattr(_local, 'profile', None)
+    start = getattr(context, '_profiler_start', None)
+    if profile is not None and start is not None:
+        profile.record(statement, time.perf_counter() - start)
+
+def start(name):
+    """Begin profiling on this thread; returns None if one is already running"""
+    if not _settings['enabled'] or current_profile() is not None:
+        return None
+    profile = _local.profile = Profile(name)
+    return profile
+
+def finish(profile):
+    """Stop profiling and log the report if anything was flagged"""
+    if profile is None or current_profile() is not profile:
+        return None
+    _local.profile = None
+    report = profile.report()
+    if report['repeated'] or report['slow']:
+        logger.warning(
+            f"Query profile {report['name']}: {report['queries']} queries in {report['query_ms']}ms, "
+            f"repeated={report['repeated']}, slow={report['slow']}"
+        )
+    else:
+        logger.debug(f"Query profile {report['name']}: {report['queries']} queries in {report['query_ms']}ms")
+    return report
+
+@contextmanager
+def profiled_block(name):
+    profile = start(name)
+    try:
+        yield profile
+    finally:
+        finish(profile)
+
+def profiled(name):
+    """Decorator profiling a scheduled job or CLI task"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _settings['enabled']:
+                return fn(*args, **kwargs)
+            with profiled_block(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def format_header(report):
+    return (
+        f"queries={report['queries']}; query_ms={report['query_ms']}; distinct={report['distinct']}; "
+        f"repeated={len(report['repeated'])}; slow={len(report['slow'])}"
+    )
+
+def _before_request():
+    # Drop anything left over from a request whose after_request never ran
+    _local.profile = None
+    start(f'{request.method} {request.path}')
+
+def _after_request(response):
+    report = finish(current_profile())
+    if report is not None and _settings['header']:
+        response.headers['X-Query-Profile'] = format_header(report)
+    return response
+
+def init_app(app):
+    _settings.update(
+        enabled=app.config.get('QUERY_PROFILER_ENABLED', False),
+        repeat_threshold=app.config.get('QUERY_PROFILER_REPEAT_THRESHOLD', 5),
+        slow_seconds=app.config.get('QUERY_PROFILER_SLOW_MS', 100) / 1000.0,
+        header=app.config.get('QUERY_PROFILER_HEADER', True)
+    )
+    if not _settings['enabled']:
+        return
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    logger.info(f"Query profiler enabled (repeat>{_settings['repeat_threshold']}, slow>={_settings['slow_seconds']}s)")
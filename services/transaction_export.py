@@ -0,0 +1,206 @@
+"""
+Bulk transaction export for reconciliation.
+
+Rows are streamed from the transaction table with a server-side cursor
+(yield_per) and written in bounded chunks, either as CSV or as Parquet row
+groups, so memory stays flat regardless of table size. Exports can run inline
+(CLI, streaming HTTP response) or as background jobs with progress reporting.
+
+Background jobs run in a thread of the web worker that accepted them, but their
+state lives in the export_job table, so any worker can report progress and
+serve the file as long as EXPORT_DIR is shared between them. expire_jobs
+deletes jobs and files older than EXPORT_TTL.
+"""
+import csv
+import io
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import update
+from models import db
+from models.export_job import ExportJob
+from models.transaction import Transaction
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = [
+    'id', 'wallet_id', 'receiver_wallet_id', 'amount', 'currency', 'transaction_type', 'status',
+    'fraud_score', 'is_suspicious', 'is_active', 'is_deleted', 'created_at', 'updated_at', 'deleted_at'
+]
+FORMATS = ('csv', 'parquet')
+
+def export_query(start=None, end=None, wallet_id=None):
+    """Transactions in [start, end), optionally for one wallet (sent or received), in id order"""
+    query = db.session.query(*[getattr(Transaction, c) for c in COLUMNS])
+    if start is not None:
+        query = query.filter(Transaction.created_at >= start)
+    if end is not None:
+        query = query.filter(Transaction.created_at < end)
+    if wallet_id is not None:
+        query = query.filter(
+            (Transaction.wallet_id == wallet_id) |
+            (Transaction.receiver_wallet_id == wallet_id)
+        )
+    return query.order_by(Transaction.id)
+
+def iter_chunks(query, chunk_size):
+    """Yield lists of at most chunk_size rows from a server-side cursor"""
+    result = query.execution_options(stream_results=True, yield_per=chunk_size)
+    chunk = []
+    for row in result:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def iter_csv(query, chunk_size=5000):
+    """Yield CSV text one chunk at a time, header first"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for chunk in iter_chunks(query, chunk_size):
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def write_csv(query, path, chunk_size=5000, progress=None):
+    written = 0
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for chunk in iter_chunks(query, chunk_size):
+            writer.writerows(chunk)
+            written += len(chunk)
+            if progress:
+                progress(written)
+    return written
+
+def parquet_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ('id', pa.int64()),
+        ('wallet_id', pa.int64()),
+        ('receiver_wallet_id', pa.int64()),
+        ('amount', pa.float64()),
+        ('currency', pa.string()),
+        ('transaction_type', pa.string()),
+        ('status', pa.string()),
+        ('fraud_score', pa.float64()),
+        ('is_suspicious', pa.bool_()),
+        ('is_active', pa.bool_()),
+        ('is_deleted', pa.bool_()),
+        ('created_at', pa.timestamp('us')),
+        ('updated_at', pa.timestamp('us')),
+        ('deleted_at', pa.timestamp('us')),
+    ])
+
+def write_parquet(query, path, chunk_size=50000, progress=None):
+    """Write one Parquet row group per chunk (requires pyarrow)"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError('Parquet export requires pyarrow (pip install pyarrow)')
+    
+    schema = parquet_schema()
+    written = 0
+    with pq.ParquetWriter(path, schema, compression='snappy') as writer:
+        for chunk in iter_chunks(query, chunk_size):
+            columns = list(zip(*chunk))
+            table = pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            )
+            writer.write_table(table)
+            written += len(chunk)
+            if progress:
+                progress(written)
+    return written
+
+def export_to_file(path, fmt='csv', start=None, end=None, wallet_id=None, chunk_size=None, progress=None):
+    if fmt not in FORMATS:
+        raise ValueError(f'Unsupported export format: {fmt}')
+    query = export_query(start, end, wallet_id)
+    if fmt == 'parquet':
+        return write_parquet(query, path, chunk_size or 50000, progress)
+    return write_csv(query, path, chunk_size or 5000, progress)
+
+def count_rows(start=None, end=None, wallet_id=None):
+    return export_query(start, end, wallet_id).order_by(None).count()
+
+def get_job(job_id):
+    return db.session.get(ExportJob, job_id)
+
+def set_job(job_id, **values):
+    """Update a job's row on its own connection, outside the streaming export query"""
+    with db.engine.begin() as conn:
+        conn.execute(update(ExportJob).where(ExportJob.id == job_id).values(**values))
+
+def start_export_job(app, fmt, start=None, end=None, wallet_id=None):
+    """Run an export in a background thread; returns the job for progress polling"""
+    if fmt not in FORMATS:
+        raise ValueError(f'Unsupported export format: {fmt}')
+    export_dir = app.config.get('EXPORT_DIR', 'exports')
+    os.makedirs(export_dir, exist_ok=True)
+    
+    job_id = uuid.uuid4().hex
+    job = ExportJob(
+        id=job_id,
+        format=fmt,
+        path=os.path.abspath(os.path.join(export_dir, f'transactions_{job_id}.{fmt}')),
+        status='pending',
+        start_at=start,
+        end_at=end,
+        wallet_id=wallet_id,
+        rows_written=0,
+        created_at=datetime.utcnow()
+    )
+    db.session.add(job)
+    db.session.commit()
+    path = job.path
+    
+    def run():
+        with app.app_context():
+            try:
+                set_job(job_id, status='running', total_rows=count_rows(start, end, wallet_id))
+                
+                def progress(written):
+                    set_job(job_id, rows_written=written)
+                
+                # SQLite cannot take a write while the export's read is open, so it only gets the final count
+                track = progress if db.engine.dialect.name != 'sqlite' else None
+                written = export_to_file(path, fmt, start, end, wallet_id, progress=track)
+                set_job(job_id, status='completed', rows_written=written, finished_at=datetime.utcnow())
+            except Exception as e:
+                logger.error(f"Export job {job_id} failed: {str(e)}")
+                set_job(job_id, status='failed', error=str(e), finished_at=datetime.utcnow())
+            finally:
+                db.session.remove()
+    
+    threading.Thread(target=run, name=f'export-{job_id}', daemon=True).start()
+    return job
+
+def expire_jobs(ttl=None, now=None):
+    """Delete export jobs older than ttl seconds (default EXPORT_TTL) and their files"""
+    if ttl is None:
+        ttl = current_app.config.get('EXPORT_TTL', 86400)
+    cutoff = (now or datetime.utcnow()) - timedelta(seconds=ttl)
+    jobs = ExportJob.query.filter(ExportJob.created_at < cutoff).all()
+    for job in jobs:
+        try:
+            os.remove(job.path)
+        except FileNotFoundError:
+            pass
+        db.session.delete(job)
+    db.session.commit()
+    if jobs:
+        logger.info(f"Expired {len(jobs)} export jobs")
+    return len(jobs)
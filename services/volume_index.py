@@ -0,0 +1,185 @@
+"""
+Per-wallet daily volume index for the admin top-users-by-volume report.
+
+Every transaction adds its amount to the sender's and the receiver's row for its
+UTC day in wallet_daily_volume, upserted in the same database transaction as the
+insert, so the index is exact across processes. Top-N over a window of days sums
+the daily rows per wallet in SQL and keeps the k largest with a heap.
+"""
+import heapq
+import logging
+from datetime import datetime, time, timedelta
+from sqlalchemy import event, func, or_
+from sqlalchemy.orm import Session
+from models import db
+from models.money import from_cents, to_cents, cents
+from models.user import User
+from models.wallet import Wallet
+from models.wallet_volume import WalletDailyVolume
+
+logger = logging.getLogger(__name__)
+
+def volume_deltas(transactions):
+    """Aggregate (wallet_id, day) -> (volume, count) for transaction-like rows"""
+    deltas = {}
+    for wallet_id, receiver_wallet_id, amount, created_at in transactions:
+        day = (created_at or datetime.utcnow()).date()
+        amount = to_cents(amount)
+        # A self-transfer counts once, matching the raw OR join
+        for target in {wallet_id, receiver_wallet_id} - {None}:
+            volume, count = deltas.get((target, day), (0, 0))
+            deltas[(target, day)] = (volume + amount, count + 1)
+    return {key: (from_cents(volume), count) for key, (volume, count) in deltas.items()}
+
+def upsert_statement(dialect):
+    table = WalletDailyVolume.__table__
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table)
+        return stmt.on_duplicate_key_update(
+            volume=table.c.volume + stmt.inserted.volume,
+            transaction_count=table.c.transaction_count + stmt.inserted.transaction_count
+        )
+    else:
+        raise NotImplementedError(f'Volume index upsert is not supported on {dialect}')
+    stmt = insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=['wallet_id', 'day'],
+        set_={
+            'volume': table.c.volume + stmt.excluded.volume,
+            'transaction_count': table.c.transaction_count + stmt.excluded.transaction_count
+        }
+    )
+
+def record_transactions(connection, transactions):
+    """Add (wallet_id, receiver_wallet_id, amount, created_at) rows to the index"""
+    deltas = volume_deltas(transactions)
+    if not deltas:
+        return
+    connection.execute(upsert_statement(connection.dialect.name), [
+        {'wallet_id': wallet_id, 'day': day, 'volume': volume, 'transaction_count': count}
+        for (wallet_id, day), (volume, count) in deltas.items()
+    ])
+
+def _after_flush(session, flush_context):
+    from models.transaction import Transaction
+    
+    transactions = [
+        (obj.wallet_id, obj.receiver_wallet_id, obj.amount, obj.created_at)
+        for obj in session.new if isinstance(obj, Transaction)
+    ]
+    if transactions:
+        record_transactions(session.connection(), transactions)
+
+def init_app(app):
+    """Keep the index updated on every ORM transaction insert"""
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+
+def is_populated():
+    return db.session.query(WalletDailyVolume.id).first() is not None
+
+def backfill():
+    """Rebuild the whole index from the transaction table"""
+    from models.transaction import Transaction
+    
+    WalletDailyVolume.query.delete(synchronize_session=False)
+    day = func.date(Transaction.created_at)
+    sent = db.session.query(
+        Transaction.wallet_id.label('wallet_id'), day.label('day'),
+        Transaction.amount.label('amount')
+    )
+    received = db.session.query(
+        Transaction.receiver_wallet_id.label('wallet_id'), day.label('day'),
+        Transaction.amount.label('amount')
+    ).filter(
+        Transaction.receiver_wallet_id.isnot(None),
+        Transaction.receiver_wallet_id != Transaction.wallet_id
+    )
+    legs = sent.union_all(received).subquery()
+    rows = db.session.query(
+        legs.c.wallet_id, legs.c.day, func.sum(legs.c.amount), func.count()
+    ).group_by(legs.c.wallet_id, legs.c.day).execution_options(yield_per=10000)
+    
+    batch, total = [], 0
+    for wallet_id, day, volume, count in rows:
+        if isinstance(day, str):
+            day = datetime.strptime(day, '%Y-%m-%d').date()
+        batch.append({'wallet_id': wallet_id, 'day': day, 'volume': float(volume), 'transaction_count': count})
+        if len(batch) == 10000:
+            db.session.execute(WalletDailyVolume.__table__.insert(), batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(WalletDailyVolume.__table__.insert(), batch)
+        total += len(batch)
+    db.session.commit()
+    logger.info(f"Backfilled {total} wallet daily volume rows")
+    return total
+
+def partial_day_volumes(start, end):
+    """Raw per-wallet volume in cents (sent plus received) for a sub-day range [start, end)"""
+    from models.transaction import Transaction
+    
+    volumes = {}
+    sent = db.session.query(Transaction.wallet_id, cents(func.sum(Transaction.amount))).filter(
+        Transaction.created_at >= start, Transaction.created_at < end
+    ).group_by(Transaction.wallet_id)
+    received = db.session.query(Transaction.receiver_wallet_id, cents(func.sum(Transaction.amount))).filter(
+        Transaction.created_at >= start, Transaction.created_at < end,
+        Transaction.receiver_wallet_id.isnot(None),
+        Transaction.receiver_wallet_id != Transaction.wallet_id
+    ).group_by(Transaction.receiver_wallet_id)
+    for wallet_id, volume in list(sent) + list(received):
+        volumes[wallet_id] = volumes.get(wallet_id, 0) + int(volume)
+    return volumes
+
+def top_users_by_volume(limit, days, now=None):
+    """
+    Top `limit` active users by volume over the last `days` days. Whole days come
+    from the daily index; the partial first day is summed from raw rows and merged in.
+    """
+    now = now or datetime.utcnow()
+    threshold = now - timedelta(days=days)
+    first_full_day = threshold.date() if threshold.time() == time.min else threshold.date() + timedelta(days=1)
+    partial = partial_day_volumes(threshold, datetime.combine(first_full_day, time.min))
+    
+    inactive_wallets = {w for (w,) in db.session.query(Wallet.id).join(
+        User, User.id == Wallet.user_id
+    ).filter(or_(User.is_active != True, User.is_active.is_(None)))}
+    
+    totals = db.session.query(
+        WalletDailyVolume.wallet_id, cents(func.sum(WalletDailyVolume.volume))
+    ).filter(
+        WalletDailyVolume.day >= first_full_day
+    ).group_by(WalletDailyVolume.wallet_id).execution_options(yield_per=10000)
+    
+    def candidates():
+        for wallet_id, volume in totals:
+            yield int(volume) + partial.pop(wallet_id, 0), wallet_id
+        # Wallets that only moved money during the partial first day
+        for wallet_id, volume in partial.items():
+            yield volume, wallet_id
+    
+    top = heapq.nlargest(
+        limit,
+        ((volume, wallet_id) for volume, wallet_id in candidates() if wallet_id not in inactive_wallets)
+    )
+    if not top:
+        return []
+    
+    users = {row.wallet_id: row for row in db.session.query(
+        Wallet.id.label('wallet_id'), User.id, User.email, User.first_name, User.last_name
+    ).join(User, User.id == Wallet.user_id).filter(Wallet.id.in_([w for _, w in top]))}
+    
+    return [{
+        'user_id': users[wallet_id].id,
+        'email': users[wallet_id].email,
+        'first_name': users[wallet_id].first_name,
+        'last_name': users[wallet_id].last_name,
+        'total_volume': from_cents(volume)
+    } for volume, wallet_id in top if wallet_id in users]
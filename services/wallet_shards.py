@@ -0,0 +1,126 @@
+"""
+Sharded sub-balances for hot wallets.
+
+A sharded wallet's balance is wallet.balance plus the sum of its wallet_shard
+rows. Credits add to one random shard, so concurrent transfers into a merchant
+wallet spread their row locks over N rows instead of queueing on the wallet
+row. Debits still go against wallet.balance under the wallet row lock and sweep
+the shards into it when it runs short; a background job consolidates shards
+regularly so the main balance stays close to the total.
+
+Only used when WALLET_SHARDING_ENABLED is set. With LEDGER_ENABLED, credits are
+already lock-free and shards are never written.
+"""
+import logging
+import random
+from datetime import datetime
+from flask import current_app, has_app_context
+from sqlalchemy import func, select, type_coerce
+from models import db
+from models.money import Money, money_sum
+from models.wallet import Wallet
+from models.wallet_shard import WalletShard
+from services.identity_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# wallet_id -> shard count (0 for unsharded), refreshed every minute. A stale
+# entry is harmless: credits to a missing shard fall back to the wallet row.
+_shard_counts = TTLCache(maxsize=100000, ttl=60.0)
+
+def is_enabled():
+    return has_app_context() and current_app.config.get('WALLET_SHARDING_ENABLED', False)
+
+def shard_count(wallet_id):
+    if not is_enabled():
+        return 0
+    count = _shard_counts.get(wallet_id)
+    if count is None:
+        count = db.session.query(func.count(WalletShard.shard)).filter(
+            WalletShard.wallet_id == wallet_id
+        ).scalar()
+        _shard_counts.set(wallet_id, count)
+    return count
+
+def credit_shard(wallet_id, amount):
+    """Add amount to a random shard; False if the wallet has no shards to take it"""
+    count = shard_count(wallet_id)
+    if not count:
+        return False
+    result = db.session.execute(
+        WalletShard.__table__.update()
+        .where(WalletShard.wallet_id == wallet_id, WalletShard.shard == random.randrange(count))
+        .values(balance=WalletShard.balance + amount, updated_at=datetime.utcnow())
+    )
+    if result.rowcount != 1:
+        _shard_counts.delete(wallet_id)  # Wallet was resharded or unsharded elsewhere
+        return False
+    return True
+
+def sweep(wallet_id):
+    """
+    Move every shard's balance into wallet.balance inside the current transaction.
+    Callers must hold the wallet row lock. Returns the amount moved.
+    """
+    shards = db.session.query(WalletShard.shard, WalletShard.balance).filter(
+        WalletShard.wallet_id == wallet_id, WalletShard.balance != 0
+    ).with_for_update().all()
+    if not shards:
+        return 0
+    total = money_sum(balance for _, balance in shards)
+    now = datetime.utcnow()
+    db.session.execute(
+        WalletShard.__table__.update()
+        .where(WalletShard.wallet_id == wallet_id, WalletShard.shard.in_([s for s, _ in shards]))
+        .values(balance=0, updated_at=now)
+    )
+    db.session.execute(
+        Wallet.__table__.update()
+        .where(Wallet.id == wallet_id)
+        .values(balance=Wallet.balance + total, updated_at=now)
+    )
+    return total
+
+def shard_balance_expression(wallet_id_column=Wallet.id):
+    """Correlated sum of a wallet's shards, 0 when unsharded"""
+    return func.coalesce(
+        select(func.sum(WalletShard.balance))
+        .where(WalletShard.wallet_id == wallet_id_column)
+        .scalar_subquery(),
+        0
+    )
+
+def total_balance_expression():
+    """wallet.balance plus its shards, as a Money expression for admin queries"""
+    return type_coerce(Wallet.balance + shard_balance_expression(), Money)
+
+def get_balance(wallet_id):
+    return db.session.query(total_balance_expression()).filter(Wallet.id == wallet_id).scalar()
+
+def set_shards(wallet_id, count):
+    """Shard a wallet into `count` sub-balances, or unshard it with 0. Commits."""
+    db.session.query(Wallet.id).filter(Wallet.id == wallet_id).with_for_update().one()
+    sweep(wallet_id)
+    db.session.query(WalletShard).filter(WalletShard.wallet_id == wallet_id).delete(synchronize_session=False)
+    if count:
+        db.session.execute(WalletShard.__table__.insert(), [
+            {'wallet_id': wallet_id, 'shard': shard, 'balance': 0, 'updated_at': datetime.utcnow()}
+            for shard in range(count)
+        ])
+    db.session.commit()
+    _shard_counts.delete(wallet_id)
+    logger.info(f"Wallet {wallet_id} now has {count} balance shards")
+
+def consolidate():
+    """Sweep every sharded wallet's shards into its main balance, one short transaction each"""
+    wallet_ids = [w for (w,) in db.session.query(WalletShard.wallet_id).filter(
+        WalletShard.balance != 0
+    ).distinct()]
+    moved = 0
+    for wallet_id in wallet_ids:
+        db.session.query(Wallet.id).filter(Wallet.id == wallet_id).with_for_update().one()
+        moved += sweep(wallet_id)
+        db.session.commit()
+    if wallet_ids:
+        logger.info(f"Consolidated shards of {len(wallet_ids)} wallets ({moved:.2f} moved)")
+    return len(wallet_ids)
@@ -0,0 +1,62 @@
+"""
+Partitioned daily fraud scan.
+
+The day's transactions are sharded by wallet_id % shards, which keeps each
+wallet's 24 hour look-back inside a single shard. Shards are scored in a
+ProcessPoolExecutor; every worker process opens its own engine, writes its
+flags with one bulk update and returns a summary that is merged for the admin
+report.
+"""
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from models.money import money_sum
+from tasks.fraud_detection import scan_block
+
+logger = logging.getLogger(__name__)
+
+_engine = None
+
+def _init_worker(database_uri, options):
+    # Connections must never be shared across a fork, so each worker gets its own engine
+    global _engine
+    _engine = create_engine(database_uri, **options)
+
+def _scan_shard(since, shard, shards):
+    with Session(_engine) as session:
+        summary = scan_block(since, session=session, shard=shard, shards=shards)
+    summary['shard'] = shard
+    return summary
+
+def merge_summaries(summaries, seconds):
+    return {
+        'shards': len(summaries),
+        'scanned': sum(s['scanned'] for s in summaries),
+        'suspicious': sum(s['suspicious'] for s in summaries),
+        'volume': money_sum(s['volume'] for s in summaries),
+        'alert_ids': [i for s in summaries for i in s['alert_ids']],
+        'seconds': round(seconds, 3),
+        'per_shard': [
+            {key: s[key] for key in ('shard', 'scanned', 'suspicious', 'seconds')}
+            for s in sorted(summaries, key=lambda s: s['shard'])
+        ]
+    }
+
+def partitioned_scan(since, workers, shards=None, database_uri=None):
+    """Scan transactions created since `since` across worker processes; needs an app context"""
+    shards = shards or current_app.config.get('FRAUD_SCAN_SHARDS') or workers
+    database_uri = database_uri or current_app.config['SQLALCHEMY_DATABASE_URI']
+    options = dict(current_app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    options.pop('poolclass', None)
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(database_uri, options)) as pool:
+        summaries = list(pool.map(_scan_shard, [since] * shards, range(shards), [shards] * shards))
+    summary = merge_summaries(summaries, time.perf_counter() - started)
+    logger.info(
+        f"Partitioned fraud scan: {summary['scanned']} transactions in {shards} shards "
+        f"on {workers} workers, {summary['suspicious']} suspicious, {summary['seconds']}s"
+    )
+    return summary
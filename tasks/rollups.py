@@ -0,0 +1,221 @@
+"""
+Hourly transaction rollups.
+
+Completed hours are aggregated into the transaction_rollup table by a compaction
+job; readers combine the rolled-up buckets with a raw aggregate over the
+un-rolled tail (everything after the watermark). Because fraud scans can still
+flag recent rows, each compaction re-rolls the last ROLLUP_RESETTLE_HOURS hours.
+Buckets are upserted, so compactions started by the scheduler and by fraud
+scans can overlap safely.
+"""
+from datetime import datetime, timedelta
+import logging
+from flask import current_app
+from sqlalchemy import func
+from models import db
+from models.money import money_sum
+from models.transaction import Transaction
+from models.transaction_rollup import TransactionRollup
+
+logger = logging.getLogger(__name__)
+
+def floor_hour(dt):
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+def ceil_hour(dt):
+    floored = floor_hour(dt)
+    return floored if floored == dt else floored + timedelta(hours=1)
+
+def hour_bucket(column):
+    """SQL expression truncating a timestamp column to the hour"""
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        return func.date_trunc('hour', column)
+    if dialect == 'mysql':
+        return func.date_format(column, '%Y-%m-%d %H:00:00')
+    return func.strftime('%Y-%m-%d %H:00:00', column)
+
+def to_datetime(value):
+    return value if isinstance(value, datetime) else datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+
+def get_watermark():
+    """End of the last rolled-up hour, or None if nothing has been rolled up"""
+    latest = db.session.query(func.max(TransactionRollup.bucket_start)).scalar()
+    return latest + timedelta(hours=1) if latest else None
+
+def raw_stats(start=None, end=None):
+    """Aggregate raw transactions in [start, end)"""
+    query = db.session.query(
+        func.count(Transaction.id),
+        func.sum(Transaction.amount),
+        func.count(Transaction.id).filter(Transaction.is_suspicious == True)
+    )
+    if start is not None:
+        query = query.filter(Transaction.created_at >= start)
+    if end is not None:
+        query = query.filter(Transaction.created_at < end)
+    count, volume, suspicious = query.one()
+    return {
+        'transaction_count': count or 0,
+        'total_volume': float(volume or 0),
+        'suspicious_count': suspicious or 0
+    }
+
+def rollup_stats(start=None, end=None):
+    """Sum rolled-up buckets whose hour starts in [start, end)"""
+    query = db.session.query(
+        func.sum(TransactionRollup.transaction_count),
+        func.sum(TransactionRollup.total_volume),
+        func.sum(TransactionRollup.suspicious_count)
+    )
+    if start is not None:
+        query = query.filter(TransactionRollup.bucket_start >= start)
+    if end is not None:
+        query = query.filter(TransactionRollup.bucket_start < end)
+    count, volume, suspicious = query.one()
+    return {
+        'transaction_count': int(count or 0),
+        'total_volume': float(volume or 0),
+        'suspicious_count': int(suspicious or 0)
+    }
+
+def combine(*parts):
+    return {
+        'transaction_count': sum(p['transaction_count'] for p in parts),
+        'total_volume': money_sum(p['total_volume'] for p in parts),
+        'suspicious_count': sum(p['suspicious_count'] for p in parts)
+    }
+
+def get_transaction_stats(start=None, end=None):
+    """
+    Transaction count, volume and suspicious count for [start, end), answered from
+    rollups for whole rolled-up hours and from raw rows for everything else.
+    """
+    watermark = get_watermark()
+    if watermark is None:
+        return raw_stats(start, end)
+    
+    rolled_start = ceil_hour(start) if start is not None else None
+    rolled_end = watermark if end is None else min(watermark, floor_hour(end))
+    if rolled_start is not None and rolled_start >= rolled_end:
+        return raw_stats(start, end)
+    
+    parts = [rollup_stats(rolled_start, rolled_end)]
+    if start is not None and start < rolled_start:
+        parts.append(raw_stats(start, rolled_start))
+    if end is None or end > rolled_end:
+        parts.append(raw_stats(rolled_end, end))
+    return combine(*parts)
+
+def upsert_statement(dialect):
+    table = TransactionRollup.__table__
+    columns = ('transaction_count', 'total_volume', 'suspicious_count', 'updated_at')
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table)
+        return stmt.on_duplicate_key_update(**{c: stmt.inserted[c] for c in columns})
+    else:
+        raise NotImplementedError(f'Rollup upsert is not supported on {dialect}')
+    stmt = insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=['bucket_start'],
+        set_={c: stmt.excluded[c] for c in columns}
+    )
+
+def compact_rollups(now=None, since=None):
+    """
+    Roll up every completed hour from `since` (default: the watermark minus the
+    resettle window) to the start of the current hour. Returns the number of
+    buckets written.
+    """
+    now = now or datetime.utcnow()
+    end = floor_hour(now)
+    if since is None:
+        watermark = get_watermark()
+        if watermark is None:
+            earliest = db.session.query(func.min(Transaction.created_at)).scalar()
+            if earliest is None:
+                return 0
+            since = earliest
+        else:
+            resettle = current_app.config.get('ROLLUP_RESETTLE_HOURS', 48)
+            since = watermark - timedelta(hours=resettle)
+    start = floor_hour(since)
+    if start >= end:
+        return 0
+    
+    bucket = hour_bucket(Transaction.created_at)
+    rows = db.session.query(
+        bucket.label('bucket_start'),
+        func.count(Transaction.id),
+        func.sum(Transaction.amount),
+        func.count(Transaction.id).filter(Transaction.is_suspicious == True)
+    ).filter(
+        Transaction.created_at >= start,
+        Transaction.created_at < end
+    ).group_by(bucket).all()
+    
+    # Overwrite every hour in the range so re-rolled hours pick up late flag changes
+    buckets = {to_datetime(b): (count, volume, suspicious) for b, count, volume, suspicious in rows}
+    hour = start
+    mappings = []
+    while hour < end:
+        count, volume, suspicious = buckets.get(hour, (0, 0, 0))
+        mappings.append({
+            'bucket_start': hour,
+            'transaction_count': count,
+            'total_volume': float(volume or 0),
+            'suspicious_count': suspicious or 0,
+            'updated_at': now
+        })
+        hour += timedelta(hours=1)
+    
+    db.session.execute(upsert_statement(db.engine.dialect.name), mappings)
+    db.session.commit()
+    logger.info(f"Rolled up {len(mappings)} hourly buckets from {start} to {end}")
+    return len(mappings)
+
+def backfill_rollups():
+    """Rebuild every rollup bucket from the raw transaction table"""
+    TransactionRollup.query.delete(synchronize_session=False)
+    db.session.commit()
+    return compact_rollups()
+
+def reconcile_rollups(start=None, end=None, tolerance=1e-6):
+    """Compare each rolled-up bucket in [start, end) against raw rows; returns mismatches"""
+    query = TransactionRollup.query.order_by(TransactionRollup.bucket_start)
+    if start is not None:
+        query = query.filter(TransactionRollup.bucket_start >= start)
+    if end is not None:
+        query = query.filter(TransactionRollup.bucket_start < end)
+    
+    rollups = {r.bucket_start: r for r in query}
+    if not rollups:
+        return []
+    
+    bucket = hour_bucket(Transaction.created_at)
+    raw = {to_datetime(b): (count, float(volume or 0), suspicious) for b, count, volume, suspicious in db.session.query(
+        bucket,
+        func.count(Transaction.id),
+        func.sum(Transaction.amount),
+        func.count(Transaction.id).filter(Transaction.is_suspicious == True)
+    ).filter(
+        Transaction.created_at >= min(rollups),
+        Transaction.created_at < max(rollups) + timedelta(hours=1)
+    ).group_by(bucket)}
+    
+    mismatches = []
+    for bucket_start, rollup in rollups.items():
+        count, volume, suspicious = raw.get(bucket_start, (0, 0.0, 0))
+        if (rollup.transaction_count != count or rollup.suspicious_count != suspicious
+                or abs(rollup.total_volume - volume) > tolerance):
+            mismatches.append({
+                'bucket_start': bucket_start.isoformat(),
+                'rollup': rollup.to_dict(),
+                'raw': {'transaction_count': count, 'total_volume': volume, 'suspicious_count': suspicious}
+            })
+    return mismatches
@@ -4,51 +4,136 @@ from models import db
 from models.transaction import Transaction
 from models.user import User
 from models.wallet import Wallet
-from sqlalchemy import func
+from tasks.rollups import compact_rollups, get_transaction_stats
+from services import metrics, query_profiler
+from services.mail_queue import send_or_enqueue
+from sqlalchemy import update
+from collections import deque
 import logging
 
 logger = logging.getLogger(__name__)
 
+SCAN_BATCH_SIZE = 1000
+
+def iter_scan_window(since, until):
+    """Stream (row, hourly_count) for every transaction created in [since, until].
+
+    Rows are read in one pass ordered by wallet and time, and a per-wallet sliding
+    window counts that wallet's transactions in the hour up to and including each row.
+    """
+    rows = db.session.query(
+        Transaction.id,
+        Transaction.wallet_id,
+        Transaction.amount,
+        Transaction.transaction_type,
+        Transaction.created_at
+    ).filter(
+        Transaction.created_at >= since - timedelta(hours=1),
+        Transaction.created_at <= until
+    ).order_by(
+        Transaction.wallet_id, Transaction.created_at, Transaction.id
+    ).execution_options(stream_results=True, yield_per=SCAN_BATCH_SIZE)
+    
+    window = deque()
+    current_wallet = None
+    group = []
+    
+    def emit(group):
+        # Rows sharing a timestamp all count each other, so evaluate them together
+        window.extend(r.created_at for r in group)
+        hour_ago = group[0].created_at - timedelta(hours=1)
+        while window[0] < hour_ago:
+            window.popleft()
+        for r in group:
+            if r.created_at >= since:
+                yield r, len(window)
+    
+    for row in rows:
+        if row.wallet_id != current_wallet:
+            if group:
+                yield from emit(group)
+            window.clear()
+            current_wallet = row.wallet_id
+            group = [row]
+        elif row.created_at == group[0].created_at:
+            group.append(row)
+        else:
+            yield from emit(group)
+            group = [row]
+    if group:
+        yield from emit(group)
+
+def flag_transactions(transaction_ids, fraud_score):
+    """Bulk-mark transactions as suspicious with the given fraud score"""
+    if not transaction_ids:
+        return
+    db.session.execute(
+        update(Transaction)
+        .where(Transaction.id.in_(transaction_ids))
+        .values(is_suspicious=True, fraud_score=fraud_score)
+        .execution_options(synchronize_session=False)
+    )
+
+def send_alert_batch(alerts):
+    """Send alerts for (row, reason) pairs, resolving all owner emails in one query"""
+    if not alerts:
+        return
+    wallet_ids = {row.wallet_id for row, _ in alerts}
+    emails = dict(db.session.query(Wallet.id, User.email).join(
+        User, User.id == Wallet.user_id
+    ).filter(Wallet.id.in_(wallet_ids)).all())
+    for row, reason in alerts:
+        send_alert_email(row, reason, user_email=emails.get(row.wallet_id))
+
+@metrics.JOB_SECONDS.time(('scan_for_fraud',))
+@query_profiler.profiled('scan_for_fraud')
 def scan_for_fraud():
     """Daily fraud scan job"""
     try:
-        # Get transactions from the last 24 hours
-        yesterday = datetime.utcnow() - timedelta(days=1)
-        recent_transactions = Transaction.query.filter(
-            Transaction.created_at >= yesterday
-        ).all()
-
-        # Scan for patterns
+        now = datetime.utcnow()
+        yesterday = now - timedelta(days=1)
+        
         suspicious_count = 0
-        for transaction in recent_transactions:
-            # Get user's transactions in last hour
-            one_hour_ago = transaction.created_at - timedelta(hours=1)
-            user_transactions = Transaction.query.filter(
-                Transaction.wallet_id == transaction.wallet_id,
-                Transaction.created_at >= one_hour_ago,
-                Transaction.created_at <= transaction.created_at
-            ).all()
-
-            # Check patterns
-            if len(user_transactions) > 10:  # High frequency
-                transaction.is_suspicious = True
-                transaction.fraud_score = 0.7
+        high_frequency_ids = []
+        large_amount_ids = []
+        alerts = []
+        
+        def flush():
+            # A large amount overrides the high frequency score, so apply it last
+            flag_transactions(high_frequency_ids, 0.7)
+            flag_transactions(large_amount_ids, 0.8)
+            send_alert_batch(alerts)
+            high_frequency_ids.clear()
+            large_amount_ids.clear()
+            alerts.clear()
+        
+        # Single ordered pass over the last 24 hours (plus one hour of look-back)
+        for row, hourly_count in iter_scan_window(yesterday, now):
+            if hourly_count > 10:  # High frequency
+                high_frequency_ids.append(row.id)
+                alerts.append((row, "High frequency transactions detected"))
                 suspicious_count += 1
-                send_alert_email(transaction, "High frequency transactions detected")
-
-            if transaction.amount > 10000:  # Large amount
-                transaction.is_suspicious = True
-                transaction.fraud_score = 0.8
+            
+            if row.amount > 10000:  # Large amount
+                large_amount_ids.append(row.id)
+                alerts.append((row, "Large transaction amount detected"))
                 suspicious_count += 1
-                send_alert_email(transaction, "Large transaction amount detected")
-
+            
+            if len(alerts) >= SCAN_BATCH_SIZE:
+                flush()
+        
+        flush()
         db.session.commit()
         
+        # Re-roll recent hours so the report sees the new flags
+        compact_rollups()
+        
         # Generate daily report
         generate_daily_report()
         
         logger.info(f"Daily fraud scan completed. Found {suspicious_count} suspicious transactions.")
     except Exception as e:
+        db.session.rollback()
         logger.error(f"Error in daily fraud scan: {str(e)}")
 
 def generate_daily_report():
@@ -56,21 +141,15 @@ def generate_daily_report():
     try:
         yesterday = datetime.utcnow() - timedelta(days=1)
         
-        # Get daily stats
-        stats = db.session.query(
-            func.count(Transaction.id).label('total_transactions'),
-            func.sum(Transaction.amount).label('total_volume'),
-            func.count(Transaction.id).filter(Transaction.is_suspicious == True).label('suspicious_count')
-        ).filter(
-            Transaction.created_at >= yesterday
-        ).first()
+        # Get daily stats from hourly rollups plus the un-rolled edges
+        stats = get_transaction_stats(start=yesterday)
         
         report = f"""
 Daily Transaction Report ({yesterday.strftime('%Y-%m-%d')})
 ----------------------------------------
-Total Transactions: {stats.total_transactions}
-Total Volume: ${stats.total_volume or 0:,.2f}
-Suspicious Transactions: {stats.suspicious_count}
+Total Transactions: {stats['transaction_count']}
+Total Volume: ${stats['total_volume']:,.2f}
+Suspicious Transactions: {stats['suspicious_count']}
 """
         
         # Send report email
@@ -80,22 +159,23 @@ Suspicious Transactions: {stats.suspicious_count}
     except Exception as e:
         logger.error(f"Error generating daily report: {str(e)}")
 
-def send_alert_email(transaction, reason):
+def send_alert_email(transaction, reason, user_email=None):
     """Mock function to send alert emails"""
-    wallet = Wallet.query.get(transaction.wallet_id)
-    user = User.query.get(wallet.user_id)
+    if user_email is None:
+        wallet = Wallet.query.get(transaction.wallet_id)
+        user_email = User.query.get(wallet.user_id).email
     
     message = f"""
 ALERT: Suspicious Transaction Detected
 ------------------------------------
-User: {user.email}
+User: {user_email}
 Amount: ${transaction.amount:,.2f}
 Type: {transaction.transaction_type}
 Reason: {reason}
 Time: {transaction.created_at}
 Transaction ID: {transaction.id}
 """
-    logger.info(f"[MOCK] Alert email sent:\n{message}")
+    send_or_enqueue(user_email, f"Suspicious Transaction Alert - {reason}", message)
 
 def send_report_email(subject, body):
     """Mock function to send report emails"""
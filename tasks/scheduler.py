@@ -0,0 +1,81 @@
+"""
+Scheduled job wiring.
+
+Jobs run inside an app context and behind a leader lease (services/job_lock.py)
+so that only one process runs each job. Web processes start a background
+scheduler only when SCHEDULER_ENABLED is set; production runs the jobs from
+run_scheduler.py instead.
+"""
+import logging
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.blocking import BlockingScheduler
+from services import idempotency, job_lock, ledger, metrics, query_profiler, transaction_export, wallet_shards
+from tasks.scheduled_tasks import scan_for_fraud
+from tasks.rollups import compact_rollups
+
+logger = logging.getLogger(__name__)
+
+def lease_ttl(app, period):
+    """
+    Lease length for a job that runs every `period` seconds: long enough that
+    instances firing a little later skip the run, short enough that the next
+    run can take it
+    """
+    return min(app.config.get('SCHEDULER_LOCK_TTL', 3600), int(period * 0.9))
+
+def run_job(app, name, fn, period):
+    """Run fn in an app context if this instance holds the job's lease"""
+    ttl = lease_ttl(app, period)
+    with app.app_context():
+        job_lock.leader_only(name, ttl)(fn)()
+
+@metrics.JOB_SECONDS.time(('compact_rollups',))
+@query_profiler.profiled('compact_rollups')
+def run_rollup_compaction():
+    compact_rollups()
+
+@metrics.JOB_SECONDS.time(('snapshot_balances',))
+def run_balance_snapshot():
+    ledger.snapshot_balances()
+
+@metrics.JOB_SECONDS.time(('consolidate_wallet_shards',))
+def run_shard_consolidation():
+    wallet_shards.consolidate()
+
+@metrics.JOB_SECONDS.time(('sweep_idempotency_keys',))
+def run_idempotency_sweep():
+    idempotency.sweep_expired()
+
+@metrics.JOB_SECONDS.time(('expire_exports',))
+def run_export_expiry():
+    transaction_export.expire_jobs()
+
+def create_scheduler(app, blocking=False):
+    scheduler = BlockingScheduler() if blocking else BackgroundScheduler()
+    scheduler.add_job(run_job, 'cron', args=(app, 'scan_for_fraud', scan_for_fraud, 86400),
+                      id='scan_for_fraud', name='scan_for_fraud', hour=0, minute=0)  # Run at midnight
+    scheduler.add_job(run_job, 'cron', args=(app, 'compact_rollups', run_rollup_compaction, 3600),
+                      id='compact_rollups', name='compact_rollups', minute=5)  # Roll up the previous hour
+    scheduler.add_job(run_job, 'cron', args=(app, 'sweep_idempotency_keys', run_idempotency_sweep, 3600),
+                      id='sweep_idempotency_keys', name='sweep_idempotency_keys', minute=35)
+    scheduler.add_job(run_job, 'cron', args=(app, 'expire_exports', run_export_expiry, 3600),
+                      id='expire_exports', name='expire_exports', minute=45)
+    if app.config.get('LEDGER_ENABLED'):
+        minutes = app.config.get('LEDGER_SNAPSHOT_INTERVAL', 15)
+        scheduler.add_job(run_job, 'interval', args=(app, 'snapshot_balances', run_balance_snapshot, minutes * 60),
+                          id='snapshot_balances', name='snapshot_balances', minutes=minutes)
+    if app.config.get('WALLET_SHARDING_ENABLED'):
+        minutes = app.config.get('WALLET_SHARD_CONSOLIDATE_INTERVAL', 5)
+        scheduler.add_job(run_job, 'interval',
+                          args=(app, 'consolidate_wallet_shards', run_shard_consolidation, minutes * 60),
+                          id='consolidate_wallet_shards', name='consolidate_wallet_shards', minutes=minutes)
+    return scheduler
+
+def init_app(app):
+    """Start an in-process scheduler unless disabled for this process"""
+    if not app.config.get('SCHEDULER_ENABLED', True):
+        logger.info("In-process scheduler disabled")
+        return None
+    scheduler = create_scheduler(app)
+    scheduler.start()
+    return scheduler